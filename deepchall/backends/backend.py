@@ -1,6 +1,7 @@
 import numpy as np
 from typing import Optional, Generator, Union, Tuple
 from enum import Enum
+from ..ragged import Ragged, batched
 
 class ShapePlaceholder:
   CONFIGURABLE = 'configurable'
@@ -36,9 +37,19 @@ class Backend:
   """
   shape = None
 
-  def gen(self) -> Generator[np.array, None, None]:
+  """
+  Integer type of the tokens in the samples returned by gen. Backends
+  used by a lang must use the lang's dtype, i.e. the smallest unsigned type
+  able to represent its alphabet (see Lang.dtype), int64 is only a
+  fallback for backends used on their own
+  """
+  dtype = np.dtype(np.int64)
+
+  def gen(self, max_length: Optional[int] = None) -> Generator[np.array, None, None]:
     """
-    Generates samples from the underlying backend.
+    Generates samples from the underlying backend. If max_length is not None
+    samples longer than max_length must not be generated, backends should
+    take advantage of it to skip the work leading to longer samples.
     """
     raise NotImplementedError("Method gen not implemented")
 
@@ -46,4 +57,22 @@ class Backend:
     """
     Takes a sample and returns true if it is well-formed
     """
-    raise NotImplementedError("Method label not implemented")
\ No newline at end of file
+    raise NotImplementedError("Method label not implemented")
+
+  def gen_batches(self, batch_size: int, max_length: Optional[int] = None) -> Generator[Ragged, None, None]:
+    """
+    Same as gen, but yields the samples in batches of batch_size elements
+    (the last one can be shorter). Only available for backends with shape
+    (1, ShapePlaceholder.LENGTH), backends should override this method if
+    they can avoid creating the samples one at a time.
+    """
+    for samples in batched(self.gen(max_length), batch_size):
+      yield Ragged.from_samples(samples, dtype=self.dtype)
+
+  def parse_batch(self, batch: Ragged) -> np.array:
+    """
+    Same as parse, but takes a batch of samples and returns a boolean
+    array with one element per sample
+    """
+    return np.fromiter(
+      (self.parse(sample) for sample in batch), dtype=bool, count=len(batch))
\ No newline at end of file
@@ -1,4 +1,5 @@
 from .backend import Backend, ShapePlaceholder
+from ..ragged import Ragged, compact_dtype, batched
 import random
 from collections import deque
 import numpy as np
@@ -26,24 +27,37 @@ class CFG(Backend):
     # Make sure all symbols are covered
     self._grammar.check_coverage(self._terminals)
 
-    # Have a way to convert terminal symbols into integers and viceversa
+    # Have a way to convert terminal symbols into integers and viceversa.
+    # The terminals are sorted so that the mapping doesn't depend on the
+    # hash seed, and is the same in every process.
     self._int_2_terminal = {}
     self._terminal_2_int = {}
 
     cnt = 0
-    for item in self._terminals:
+    for item in sorted(self._terminals):
       self._terminal_2_int[item] = cnt
       self._int_2_terminal[cnt] = item
       cnt += 1
 
-  def gen(self) -> Generator[np.array, None, None]:
-    # Queue of tuples (expr, state)
+    self.dtype = compact_dtype(len(self._terminals))
+    self._parser = EarleyChartParser(self._grammar)
+
+  def _gen_exprs(self, max_length: Optional[int] = None) -> Generator[List[int], None, None]:
     for terminals in generate(self._grammar, depth=self._max_depth):
+      # nltk can't bound the length of the expansions, so longer
+      # expressions are only filtered out
+      if max_length is not None and len(terminals) > max_length:
+        continue
       # Convert terminal symbols to integers
-      converted_terminals = [self._terminal_2_int[t] for t in terminals]
+      yield [self._terminal_2_int[t] for t in terminals]
+
+  def gen(self, max_length: Optional[int] = None) -> Generator[np.array, None, None]:
+    for expr in self._gen_exprs(max_length):
+      yield np.array(expr, dtype=self.dtype).reshape(1, -1)
 
-      # Convert to numpy array
-      yield np.array([converted_terminals])
+  def gen_batches(self, batch_size: int, max_length: Optional[int] = None) -> Generator[Ragged, None, None]:
+    for exprs in batched(self._gen_exprs(max_length), batch_size):
+      yield Ragged.from_lists(exprs, dtype=self.dtype)
 
   def parse(self, sample: np.array) -> bool:
     # We expect samples to have shape (1, N)
@@ -52,9 +66,8 @@ class CFG(Backend):
     # Convert sample into a sentence supported
     # by the grammar
     try:
-      sent = [self._int_2_terminal[val] for val in sample[0,:]]
-    except IndexError:
+      sent = [self._int_2_terminal[val] for val in sample[0].tolist()]
+    except KeyError:
       return False
 
-    parser = EarleyChartParser(self._grammar)
-    return parser.parse_one(sent) is not None
+    return self._parser.parse_one(sent) is not None
@@ -1,8 +1,9 @@
 from .backend import Backend, ShapePlaceholder
+from ..ragged import Ragged, batched
 import random
 from collections import deque
 import numpy as np
-from typing import Optional, Dict, List, Generator, Tuple
+from typing import Optional, Dict, List, Generator, Tuple, Set
 
 class FSM(Backend):
   name = 'fsm'
@@ -28,18 +29,23 @@ class FSM(Backend):
     s[2].add_transition(input_symbol=3, states=[s[2]])
     s[2].set_terminal(True)
   """
-  def __init__(self, transitions : Optional[Dict[str, List["FSM"]]] = None, is_terminal: bool = False):
+  def __init__(self, transitions : Optional[Dict[str, List["FSM"]]] = None, is_terminal: bool = False,
+               dtype: np.dtype = Backend.dtype):
     """
     Create a new state instance.
 
     transitions: optional dictionnary of transitions
     is_terminal: indicates whether this state must be considered terminal (note 
       that a state with no transitions if already considered terminal by default)
+    dtype: type of the samples generated when this state is used as the
+      interface to the FSM, must be able to represent all input symbols
     """
     if transitions is None:
       transitions = {}
     self.transitions = transitions
     self._is_terminal_overwrite = is_terminal
+    self.dtype = np.dtype(dtype)
+    self._distances_cache = None
 
   def set_terminal(self, is_terminal: bool = True) -> None:
     """
@@ -70,13 +76,98 @@ class FSM(Backend):
     """
     return self.transitions.get(input_symbol, [])
 
-  def gen(self) -> Generator[np.array, None, None]:
+  def _successors(self) -> List["FSM"]:
     """
-    Generates up to max_samples well formed expressions beloging to the underlying
-    language (see gen).
+    Returns the states reachable from this state with a single transition
+    (without duplicates)
     """
+    return list({id(t): t for states in self.transitions.values() for t in states}.values())
+
+  def _distances(self) -> Tuple[Dict["FSM", float], Dict["FSM", float]]:
+    """
+    For every state reachable from this state computes the shortest and the
+    longest number of input symbols that lead from it to a terminal state.
+    States from which no terminal state can be reached (dead states) have a
+    shortest distance of inf, states that can loop before reaching a terminal
+    state have a longest distance of inf.
+
+    The result is computed the first time it is needed and then reused, so
+    the FSM should not be modified once used to generate or parse.
+    """
+    if self._distances_cache is not None:
+      return self._distances_cache
+
+    # Collect reachable states and reversed transitions
+    successors = {self: self._successors()}
+    queue = deque([self])
+    while queue:
+      for t in successors[queue.popleft()]:
+        if t not in successors:
+          successors[t] = t._successors()
+          queue.append(t)
+    predecessors = {s: [] for s in successors}
+    for s, ts in successors.items():
+      for t in ts:
+        predecessors[t].append(s)
+
+    # Shortest distances, breadth-first from the terminal states
+    shortest = {s: float('inf') for s in successors}
+    queue = deque()
+    for s in successors:
+      if s.is_terminal():
+        shortest[s] = 0
+        queue.append(s)
+    while queue:
+      t = queue.popleft()
+      for s in predecessors[t]:
+        if shortest[s] == float('inf'):
+          shortest[s] = shortest[t] + 1
+          queue.append(s)
+
+    # Longest distances over live (not dead) states, starting from the
+    # states whose live successors are all known. The states left once
+    # done can reach a loop of live states.
+    longest = {s: float('inf') for s in successors}
+    live_successors = {
+      s: [t for t in ts if shortest[t] < float('inf')]
+      for s, ts in successors.items()
+    }
+    pending = {s: len(ts) for s, ts in live_successors.items()}
+    queue = deque(
+      s for s in successors if pending[s] == 0 and shortest[s] < float('inf'))
+    while queue:
+      s = queue.popleft()
+      longest[s] = max(
+        [0] * s.is_terminal() + [longest[t] + 1 for t in live_successors[s]])
+      for p in predecessors[s]:
+        if shortest[p] < float('inf'):
+          pending[p] -= 1
+          if pending[p] == 0:
+            queue.append(p)
+
+    self._distances_cache = (shortest, longest)
+    return self._distances_cache
+
+  def _gen_exprs(self, max_length: Optional[int] = None) -> Generator[Tuple[int, ...], None, None]:
+    """
+    Generates well formed expressions as tuples of input symbols, in
+    breadth-first order. Paths that cannot reach a terminal state within
+    max_length symbols are not explored, nor are dead states, even without
+    max_length.
+    """
+    shortest, _ = self._distances()
+    budget = float('inf') if max_length is None else max_length
+
+    def reachable(state: "FSM", remaining: float) -> bool:
+      # Without max_length the budget is inf, so dead states must be
+      # rejected explicitly
+      return shortest[state] < float('inf') and shortest[state] <= remaining
+
+    if not reachable(self, budget):
+      return
+
     # Queue of tuples (expr, state)
-    queue = deque([(np.array([[]]), self)])
+    queue = deque([((), self)])
 
     while queue:
 
@@ -86,9 +177,22 @@ class FSM(Backend):
         yield expr
 
       for input_, states in state.transitions.items():
-        new_expr = np.concatenate((expr,[[input_]]), axis=1)
+        new_expr = expr + (input_,)
+        remaining = budget - len(new_expr)
         for new_state in states:
-          queue.append((new_expr, new_state))
+          if reachable(new_state, remaining):
+            queue.append((new_expr, new_state))
+
+  def gen(self, max_length: Optional[int] = None) -> Generator[np.array, None, None]:
+    """
+    Generates well formed expressions beloging to the underlying language
+    """
+    for expr in self._gen_exprs(max_length):
+      yield np.array(expr, dtype=self.dtype).reshape(1, -1)
+
+  def gen_batches(self, batch_size: int, max_length: Optional[int] = None) -> Generator[Ragged, None, None]:
+    for exprs in batched(self._gen_exprs(max_length), batch_size):
+      yield Ragged.from_lists(exprs, dtype=self.dtype)
 
   def parse(self, sample: np.array) -> bool:
     """
@@ -98,11 +202,26 @@ class FSM(Backend):
     # We expect samples to have shape (1, N)
     assert sample.shape[0] == 1
 
-    if sample.shape[1] == 0:
+    shortest, longest = self._distances()
+    return self._accepts(sample[0].tolist(), 0, shortest, longest, set())
+
+  def _accepts(self, expr: List[int], pos: int, shortest: Dict["FSM", float],
+               longest: Dict["FSM", float], failed: Set[Tuple[int, int]]) -> bool:
+    """
+    Returns True if expr[pos:] leads from this state to a terminal state.
+    States that cannot accept the remaining number of symbols are skipped and
+    (state, pos) pairs already known to fail are collected in failed.
+    """
+    remaining = len(expr) - pos
+    if not shortest[self] <= remaining <= longest[self]:
+      return False
+    if remaining == 0:
       return self.is_terminal()
+    if (id(self), pos) in failed:
+      return False
 
-    states = self.traverse(int(sample[0,0]))
-    for state in states:
-      if state.parse(sample[:, 1:]):
+    for state in self.traverse(expr[pos]):
+      if state._accepts(expr, pos+1, shortest, longest, failed):
         return True
+    failed.add((id(self), pos))
     return False
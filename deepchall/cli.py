@@ -1,9 +1,15 @@
 import click
 from .index import INDEX
 from .runner import Runner
+from .profiling import Profiler, SamplingProfiler
 from .nets.net import UnsupportedNetParamError
 from typing import Dict, Any
 
+def print_extra_params(extra_params: Dict[str, Any]):
+    print("extra params:")
+    for k, (desc, default) in extra_params.items():
+        print(f"\t{k}: {desc} (default: {default!r})")
+
 @click.group()
 def cli():
     pass
@@ -31,7 +37,7 @@ def langs():
         print(f"description: {l.desc}")
         print(f"shape: {l.shape}")
         print(f"alphabet size: {l.alphabet_size}")
-        print(f"extra params: {l.extra_params}")
+        print_extra_params(l.extra_params)
 
 @show.command()
 def nets():
@@ -39,15 +45,33 @@ def nets():
         print("")
         print(f"name: {name}")
         print(f"description: {n.desc}")
-        print(f"extra params: {n.extra_params}")
+        print_extra_params(n.extra_params)
 
 @cli.command()
 @click.argument('config')
-def run(config: str):
+@click.option('--profile', 'profile_dir', type=click.Path(file_okay=False), default=None,
+              help='Profile each phase of every run and write the results in this directory')
+@click.option('--profile-top', type=int, default=20, show_default=True,
+              help='Number of hotspots shown in the profile summaries')
+@click.option('--profiler', 'profiler_kind', type=click.Choice(['auto', 'cprofile', 'sampling']),
+              default='auto', show_default=True,
+              help='Profiler to use, auto picks the sampling profiler if pyinstrument is installed')
+def run(config: str, profile_dir: str, profile_top: int, profiler_kind: str):
     """
     Run a given config
     """
-    runner = Runner(config)
+    if profiler_kind == 'auto':
+        sampling = SamplingProfiler is not None
+    else:
+        sampling = profiler_kind == 'sampling'
+
+    try:
+        profiler = Profiler(profile_dir, top=profile_top, sampling=sampling)
+    except ValueError as e:
+        print(f"[!] Error - {e}")
+        return
+
+    runner = Runner(config, profiler=profiler)
     try:
         runner.run()
     except UnsupportedNetParamError as e:
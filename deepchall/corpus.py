@@ -0,0 +1,159 @@
+"""
+A corpus is a directory holding a set of samples of shape (1, N) on disk,
+in a format that can be memory-mapped:
+- tokens.bin: all the samples concatenated, using the smallest unsigned
+  integer type able to represent the alphabet
+- offsets.bin: int64 offsets of the samples in tokens.bin, sample i spans
+  tokens[offsets[i]:offsets[i+1]]
+- meta.json: dtype, alphabet size and sizes of the corpus
+"""
+
+import json
+import os
+import numpy as np
+from typing import Optional, Generator, Iterable
+from .ragged import Ragged, compact_dtype
+
+TOKENS_FILE = 'tokens.bin'
+OFFSETS_FILE = 'offsets.bin'
+META_FILE = 'meta.json'
+
+class CorpusWriter:
+    """
+    Writes samples to a corpus one at a time, keeping only the I/O buffers
+    in memory. The corpus is complete once the writer is closed.
+
+    Example of usage:
+      with CorpusWriter(path, alphabet_size=3) as writer:
+        for sample in bkd.gen():
+          writer.write(sample)
+    """
+    def __init__(self, path: str, alphabet_size: int):
+        os.makedirs(path, exist_ok=True)
+        self._path = path
+        self._alphabet_size = alphabet_size
+        self._dtype = compact_dtype(alphabet_size)
+        self._tokens_fd = open(os.path.join(path, TOKENS_FILE), 'wb')
+        self._offsets_fd = open(os.path.join(path, OFFSETS_FILE), 'wb')
+        self._num_samples = 0
+        self._num_tokens = 0
+        self._offsets_fd.write(np.int64(0).tobytes())
+
+    def write(self, sample: np.array) -> None:
+        if sample.ndim != 2 or sample.shape[0] != 1:
+            raise ValueError(
+                f'Expected a sample of shape (1, N), got {sample.shape}')
+        if sample.size > 0 and (sample.min() < 0 or
+                                sample.max() >= self._alphabet_size):
+            raise ValueError(
+                f'Sample values out of range [0, {self._alphabet_size})')
+
+        self._tokens_fd.write(sample.astype(self._dtype).tobytes())
+        self._num_tokens += sample.shape[1]
+        self._num_samples += 1
+        self._offsets_fd.write(np.int64(self._num_tokens).tobytes())
+
+    def write_batch(self, batch: Ragged) -> None:
+        if len(batch.values) > 0 and (batch.values.min() < 0 or
+                                      batch.values.max() >= self._alphabet_size):
+            raise ValueError(
+                f'Sample values out of range [0, {self._alphabet_size})')
+
+        self._tokens_fd.write(batch.values.astype(self._dtype).tobytes())
+        self._offsets_fd.write(
+            (batch.offsets[1:] + self._num_tokens).astype(np.int64).tobytes())
+        self._num_tokens += len(batch.values)
+        self._num_samples += len(batch)
+
+    def close(self) -> None:
+        self._tokens_fd.close()
+        self._offsets_fd.close()
+        with open(os.path.join(self._path, META_FILE), 'w') as fd:
+            json.dump({
+                'dtype': self._dtype.name,
+                'alphabet_size': self._alphabet_size,
+                'num_samples': self._num_samples,
+                'num_tokens': self._num_tokens,
+            }, fd)
+
+    def __enter__(self) -> "CorpusWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+def write_corpus(path: str, gen: Iterable[np.array], alphabet_size: int) -> "Corpus":
+    """
+    Writes all the samples of gen (e.g. a Backend.gen generator) to a corpus
+    and returns the corpus
+    """
+    with CorpusWriter(path, alphabet_size=alphabet_size) as writer:
+        for sample in gen:
+            writer.write(sample)
+    return Corpus(path)
+
+class Corpus:
+    """
+    Read-only access to a corpus. Both tokens and offsets are memory-mapped,
+    so the resident footprint only depends on the samples being accessed.
+    """
+    def __init__(self, path: str):
+        with open(os.path.join(path, META_FILE)) as fd:
+            meta = json.load(fd)
+        self.alphabet_size = meta['alphabet_size']
+        self.num_tokens = meta['num_tokens']
+        self._num_samples = meta['num_samples']
+
+        # np.memmap doesn't support empty files
+        if self.num_tokens > 0:
+            self._tokens = np.memmap(
+                os.path.join(path, TOKENS_FILE), dtype=meta['dtype'], mode='r')
+        else:
+            self._tokens = np.zeros(0, dtype=meta['dtype'])
+        self._offsets = np.memmap(
+            os.path.join(path, OFFSETS_FILE), dtype=np.int64, mode='r')
+
+    def __len__(self) -> int:
+        return self._num_samples
+
+    def __getitem__(self, i: int) -> np.array:
+        if not -len(self) <= i < len(self):
+            raise IndexError('Sample index out of range')
+        i %= len(self)
+        return np.array(self._tokens[self._offsets[i]:self._offsets[i+1]]).reshape(1, -1)
+
+    def __iter__(self) -> Generator[np.array, None, None]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def lengths(self) -> np.array:
+        return np.diff(self._offsets)
+
+    def take(self, indices: np.array) -> Ragged:
+        """
+        Loads the samples at the given indices in memory
+        """
+        return Ragged(self._tokens, self._offsets).take(indices)
+
+    def batch(self, indices: np.array, length: Optional[int] = None,
+              pad_value: int = -1) -> np.array:
+        """
+        Gathers the samples at the given indices in a (len(indices), length)
+        int array, padded with pad_value. If length is None the samples are
+        padded to the longest one.
+        """
+        return self.take(indices).padded(length=length, pad_value=pad_value)
+
+    def batches(self, batch_size: int, length: Optional[int] = None,
+                pad_value: int = -1, shuffle: bool = True,
+                seed: Optional[int] = None) -> Generator[np.array, None, None]:
+        """
+        Yields mini-batches covering the whole corpus once (see batch), in a
+        random order if shuffle is True
+        """
+        if shuffle:
+            order = np.random.default_rng(seed).permutation(len(self))
+        else:
+            order = np.arange(len(self))
+        for i in range(0, len(self), batch_size):
+            yield self.batch(order[i:i+batch_size], length=length, pad_value=pad_value)
@@ -0,0 +1,135 @@
+import math
+import numpy as np
+from typing import Optional
+
+from .ragged import Ragged
+
+def _splitmix64(z: np.array) -> np.array:
+    """
+    Mixes the bits of an array of uint64 (see SplitMix64)
+    """
+    z = z + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+def sample_hashes(batch: Ragged, seed: int = 0) -> np.array:
+    """
+    Returns a 64-bit hash for every sample of the batch, computed at once for
+    the whole batch. Different seeds give independent hashes.
+    """
+    lengths = batch.lengths()
+    positions = np.arange(len(batch.values)) - np.repeat(batch.offsets[:-1], lengths)
+    with np.errstate(over='ignore'):
+        # Hash every (position, value) pair, then sum them per sample
+        tokens = _splitmix64(
+            batch.values.astype(np.uint64) * np.uint64(0xD6E8FEB86659FD93) +
+            positions.astype(np.uint64) * np.uint64(0xA0761D6478BD642F) +
+            np.uint64(seed))
+        sums = np.zeros(len(tokens)+1, dtype=np.uint64)
+        np.cumsum(tokens, out=sums[1:])
+        hashes = sums[batch.offsets[1:]] - sums[batch.offsets[:-1]]
+        return _splitmix64(hashes ^ _splitmix64(lengths.astype(np.uint64) + np.uint64(seed)))
+
+class ExactSampleSet:
+    """
+    A set of samples, storing a copy of each of them
+    """
+    def __init__(self):
+        self._samples = set()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def _keys(self, batch: Ragged):
+        values, offsets = batch.values, batch.offsets
+        return [values[offsets[i]:offsets[i+1]].tobytes() for i in range(len(batch))]
+
+    def add(self, batch: Ragged) -> np.array:
+        """
+        Adds the samples of the batch to the set and returns a boolean array,
+        True for the samples that were not in the set yet (only the first
+        occurrence is True when a sample is repeated within the batch)
+        """
+        new = np.zeros(len(batch), dtype=bool)
+        for i, key in enumerate(self._keys(batch)):
+            if key not in self._samples:
+                self._samples.add(key)
+                new[i] = True
+        return new
+
+    def contains(self, batch: Ragged) -> np.array:
+        return np.array([key in self._samples for key in self._keys(batch)], dtype=bool)
+
+class BloomSampleSet:
+    """
+    A set of samples backed by a Bloom filter, using a fixed amount of memory
+    (about 1.2 bytes per sample for a 1% error rate). Samples never added can
+    be reported as contained with a probability of about error_rate, as long
+    as no more than capacity samples are added.
+    """
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        if capacity < 1:
+            raise ValueError('The capacity must be > 0')
+        if not 0 < error_rate < 1:
+            raise ValueError('The error rate must be in (0, 1)')
+
+        self._num_bits = int(math.ceil(-capacity * math.log(error_rate) / math.log(2)**2))
+        self._num_hashes = max(1, int(round(self._num_bits / capacity * math.log(2))))
+        self._bits = np.zeros((self._num_bits+7) // 8, dtype=np.uint8)
+        self._len = 0
+
+    def __len__(self) -> int:
+        """
+        Number of samples added to the set (not counting the ones reported as
+        already contained)
+        """
+        return self._len
+
+    def _positions(self, batch: Ragged) -> np.array:
+        # Derive all the hash functions from two hashes (Kirsch-Mitzenmacher)
+        h1 = sample_hashes(batch, seed=0)
+        h2 = sample_hashes(batch, seed=1) | np.uint64(1)
+        i = np.arange(self._num_hashes, dtype=np.uint64)
+        with np.errstate(over='ignore'):
+            return (h1[:,None] + i*h2[:,None]) % np.uint64(self._num_bits)
+
+    def _contains(self, positions: np.array) -> np.array:
+        bits = (self._bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return bits.all(axis=1)
+
+    def add(self, batch: Ragged) -> np.array:
+        """
+        Same as ExactSampleSet.add, except that a new sample can be reported
+        as not new with a probability of about error_rate
+        """
+        positions = self._positions(batch)
+
+        # Only the first occurrence of a sample within the batch can be new
+        _, first = np.unique(positions, axis=0, return_index=True)
+        new = np.zeros(len(batch), dtype=bool)
+        new[first] = True
+        new &= ~self._contains(positions)
+
+        added = positions[new].ravel()
+        np.bitwise_or.at(
+            self._bits,
+            added >> np.uint64(3),
+            (np.uint8(1) << (added & np.uint64(7)).astype(np.uint8)),
+        )
+        self._len += int(new.sum())
+        return new
+
+    def contains(self, batch: Ragged) -> np.array:
+        return self._contains(self._positions(batch))
+
+def make_sample_set(kind: str, capacity: Optional[int] = None, error_rate: float = 0.001):
+    """
+    Returns an empty set of samples, kind is either 'exact' or 'bloom'
+    (capacity is required for 'bloom')
+    """
+    if kind == 'exact':
+        return ExactSampleSet()
+    if kind == 'bloom':
+        return BloomSampleSet(capacity, error_rate=error_rate)
+    raise ValueError(f'Unknown sample set {kind}')
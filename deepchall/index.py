@@ -1,19 +1,49 @@
 from .backends.fsm import FSM
 from .backends.cfg import CFG
-from .langs.toy_fsm import ToyFSM
-from .langs.toy_cfg import ToyCFG
-from .nets.simple_lstm import SimpleLSTM
+from .langs.index import LANGS
+from .nets.ngram import NGram
+from collections.abc import Mapping
+from typing import Dict, Iterator, Union
+import importlib
+import importlib.util
+
+class LazyEntries(Mapping):
+    """
+    Entries of the index that can be given as 'module:attr' strings instead
+    of classes, the module is only imported when the entry is accessed. Used
+    for entries depending on heavy packages (e.g. TensorFlow), so that they
+    are only loaded when a config or a command needs them.
+    """
+    def __init__(self, entries: Dict[str, Union[type, str]]):
+        self._entries = dict(entries)
+
+    def __getitem__(self, name: str) -> type:
+        entry = self._entries[name]
+        if isinstance(entry, str):
+            module, attr = entry.split(':')
+            entry = getattr(importlib.import_module(module, __package__), attr)
+            self._entries[name] = entry
+        return entry
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+# TensorFlow is heavy and only needed by some nets, those are registered
+# only when it is installed and imported when first used
+_NETS = {
+    NGram.name: NGram,
+}
+if importlib.util.find_spec('tensorflow') is not None:
+    _NETS['simple_lstm'] = '.nets.simple_lstm:SimpleLSTM'
 
 INDEX = {
     'backends' : {
         FSM.name: FSM,
         CFG.name: CFG,
     },
-    'langs' : {
-        ToyFSM.name: ToyFSM,
-        ToyCFG.name: ToyCFG,
-    },
-    'nets' : {
-        SimpleLSTM.name: SimpleLSTM,
-    },
+    'langs' : LANGS,
+    'nets' : LazyEntries(_NETS),
 }
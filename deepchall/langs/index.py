@@ -0,0 +1,13 @@
+from .toy_fsm import ToyFSM
+from .toy_cfg import ToyCFG
+from .random_fsm import RandomFSM
+from .random_cfg import RandomCFG
+
+# Kept apart from deepchall.index so that langs can be built (e.g. in a
+# pipeline process) without importing the nets
+LANGS = {
+    ToyFSM.name: ToyFSM,
+    ToyCFG.name: ToyCFG,
+    RandomFSM.name: RandomFSM,
+    RandomCFG.name: RandomCFG,
+}
@@ -1,5 +1,7 @@
 from ..backends.backend import Backend
+from ..ragged import compact_dtype
 from typing import Dict
+import numpy as np
 
 class Lang:
     """
@@ -61,5 +63,14 @@ class Lang:
         """
         raise NotImplementedError('Method init not implemented')
 
+    @property
+    def dtype(self) -> np.dtype:
+        """
+        Integer type of the tokens generated by the language, i.e. the
+        smallest unsigned type able to represent the alphabet. Backends
+        returned by get must generate samples of this type.
+        """
+        return compact_dtype(self.alphabet_size)
+
     def get(self) -> Backend:
         raise NotImplementedError('Method get not implemented')
\ No newline at end of file
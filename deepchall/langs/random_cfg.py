@@ -0,0 +1,75 @@
+from .lang import Lang
+from ..backends.cfg import CFG
+from ..backends.backend import Backend
+from typing import Dict
+import numpy as np
+
+class RandomCFG(Lang):
+    name = 'random_cfg'
+    desc = """
+        A random grammar, procedurally built from a seed. Every nonterminal
+        has at least one production made of terminals only, so that all of
+        them can be expanded, the other productions mix terminals and
+        nonterminals at random. Meant for scaling studies.
+    """
+    alphabet_size = 10
+    shape = (1, None)
+    extra_params = {
+        "seed": ("Seed used to build the grammar", 0),
+        "num_nonterminals": ("Number of nonterminal symbols", 50),
+        "num_symbols": ("Size of the alphabet (terminal symbols)", alphabet_size),
+        "num_productions": ("Number of productions, at least num_nonterminals", 200),
+        "max_rhs": ("Maximum number of symbols on the right of a production", 4),
+        "terminal_prob": ("Probability of drawing a terminal in a production", 0.5),
+        "max_depth": ("Maximum expansion depth of the grammar", 8),
+    }
+
+    def init(self, params: Dict) -> None:
+        if params["num_nonterminals"] < 1:
+            raise ValueError("num_nonterminals must be > 0")
+        if params["num_productions"] < params["num_nonterminals"]:
+            raise ValueError("num_productions must be at least num_nonterminals")
+        if params["max_rhs"] < 1:
+            raise ValueError("max_rhs must be > 0")
+
+        self.alphabet_size = params["num_symbols"]
+        self._max_depth = params["max_depth"]
+        self._grammar = self._make_grammar(params)
+
+    def _make_grammar(self, params: Dict) -> str:
+        rng = np.random.default_rng(params["seed"])
+        num_nonterminals = params["num_nonterminals"]
+        max_rhs = params["max_rhs"]
+
+        def terminal() -> str:
+            return f"'{rng.integers(self.alphabet_size)}'"
+
+        # One terminal-only production per nonterminal, the others
+        # assigned to random nonterminals
+        lhs = np.concatenate((
+            np.arange(num_nonterminals),
+            rng.integers(num_nonterminals,
+                         size=params["num_productions"]-num_nonterminals),
+        ))
+        productions = []
+        for i, nt in enumerate(lhs):
+            rhs = []
+            for _ in range(rng.integers(1, max_rhs+1)):
+                if i < num_nonterminals or rng.random() < params["terminal_prob"]:
+                    rhs.append(terminal())
+                else:
+                    rhs.append(f"N{rng.integers(num_nonterminals)}")
+            productions.append((nt, rhs))
+
+        # Make sure every symbol of the alphabet is used
+        used = {sym for _, rhs in productions for sym in rhs}
+        for sym in range(self.alphabet_size):
+            if f"'{sym}'" not in used:
+                productions.append((rng.integers(num_nonterminals), [f"'{sym}'"]))
+
+        # nltk takes the lhs of the first production as start symbol
+        productions.sort(key=lambda p: p[0])
+        return "\n".join(f"N{nt} -> {' '.join(rhs)}" for nt, rhs in productions)
+
+    def get(self) -> Backend:
+        return CFG(grammar=self._grammar,max_depth=self._max_depth)
@@ -0,0 +1,76 @@
+from .lang import Lang
+from ..backends.fsm import FSM
+from ..backends.backend import Backend
+from typing import Dict
+import numpy as np
+
+class RandomFSM(Lang):
+    name = 'random_fsm'
+    desc = """
+        A random non-deterministic FSM, procedurally built from a seed. Every
+        state has out_degree transitions over distinct symbols, each leading
+        to up to branching random states. At least one terminal state is
+        reachable, so the language is never empty. Meant for scaling studies.
+    """
+    alphabet_size = 10
+    shape = (1, None)
+    extra_params = {
+        "seed": ("Seed used to build the FSM", 0),
+        "num_states": ("Number of states of the FSM", 1000),
+        "num_symbols": ("Size of the alphabet", alphabet_size),
+        "out_degree": ("Number of input symbols accepted by every state", 2),
+        "branching": ("Maximum number of states reached by a transition", 2),
+        "terminal_ratio": ("Fraction of terminal states", 0.1),
+    }
+
+    def init(self, params: Dict) -> None:
+        if params["num_states"] < 1:
+            raise ValueError("num_states must be > 0")
+        if not 1 <= params["out_degree"] <= params["num_symbols"]:
+            raise ValueError("out_degree must be between 1 and num_symbols")
+        if params["branching"] < 1:
+            raise ValueError("branching must be > 0")
+
+        self.alphabet_size = params["num_symbols"]
+        self._params = params
+
+    def get(self) -> Backend:
+        rng = np.random.default_rng(self._params["seed"])
+        num_states = self._params["num_states"]
+        out_degree = self._params["out_degree"]
+        branching = self._params["branching"]
+
+        # Draw the whole FSM at once: the symbols of every state, the number
+        # of targets of every transition and the targets themselves
+        symbols = rng.permuted(
+            np.tile(np.arange(self.alphabet_size), (num_states, 1)), axis=1
+        )[:,:out_degree]
+        num_targets = rng.integers(1, branching+1, size=(num_states, out_degree))
+        targets = rng.integers(0, num_states, size=(num_states, out_degree, branching))
+        terminals = rng.random(num_states) < self._params["terminal_ratio"]
+
+        # Make sure the language is not empty: if no terminal state can be
+        # reached from the first state, one of the reachable states becomes
+        # terminal (other seeds give the same FSM as without this check)
+        reachable = np.zeros(num_states, dtype=bool)
+        reachable[0] = True
+        frontier = np.array([0])
+        while len(frontier) > 0:
+            mask = np.arange(branching) < num_targets[frontier][:,:,None]
+            successors = np.unique(targets[frontier][mask])
+            frontier = successors[~reachable[successors]]
+            reachable[frontier] = True
+        if not terminals[reachable].any():
+            terminals[rng.choice(np.flatnonzero(reachable))] = True
+
+        s = [
+            FSM(is_terminal=bool(terminals[i]), dtype=self.dtype)
+            for i in range(num_states)
+        ]
+        for i in range(num_states):
+            for j in range(out_degree):
+                s[i].add_transition(
+                    input_symbol=int(symbols[i,j]),
+                    states=[s[t] for t in targets[i,j,:num_targets[i,j]]],
+                )
+        return s[0]
@@ -17,7 +17,7 @@ class ToyFSM(Lang):
         pass 
 
     def get(self) -> Backend:
-        s = [FSM(is_terminal=True) for _ in range(3)]
+        s = [FSM(is_terminal=True, dtype=self.dtype) for _ in range(3)]
         s[0].add_transition(input_symbol=0, states=[s[0],s[1]])
         s[1].add_transition(input_symbol=1, states=[s[1],s[2]])
         s[2].add_transition(input_symbol=2, states=[s[2],s[0]])
@@ -1,5 +1,7 @@
 from ..backends.backend import Backend
-from typing import Generator, Dict
+from ..corpus import Corpus
+from ..ragged import Ragged
+from typing import Generator, Dict, Iterator
 import numpy as np
 
 class UnsupportedNetParamError(RuntimeError):
@@ -30,6 +32,13 @@ class Net:
     """
     extra_params = {}
 
+    """
+    Lang params (e.g. 'epochs') that don't affect the training of this
+    network. Runs that differ only in these params share the same trained
+    network.
+    """
+    ignored_lang_params = ()
+
     def init(self, params: Dict) -> None:
         """
         This method is called before training the network. It should be used
@@ -38,6 +47,8 @@ class Net:
         alphabet_size: an int, the number of tokens used by the language to
             train on. If this is N, then the language tokens will be represented
             by integers v where 0 <= v < N
+        dtype: the numpy integer type used by the language for its tokens,
+            expressions returned by gen should use the same type
         max_samples: an int, the maximum amount of samples that will be
             generated by the language
         max_length: an optional int, the maximum length of the expressions
@@ -45,11 +56,11 @@ class Net:
             offer any guarantees about the maximum size
         epochs: an int, number of epochs to train, to be used by net as
             a hint about the amount of training 
-        <param>: any network-specific parameters defined in net_params
+        <param>: any network-specific parameters defined in extra_params
 
         All parameters are guaranteed to be present in the params dictionary,
         including net-specific parameters as long as they are defined in 
-        the net_params attribute.
+        the extra_params attribute.
         """
         raise NotImplementedError('Method init is not implemented')
 
@@ -62,6 +73,24 @@ class Net:
         """
         raise NotImplementedError('Method train is not implemented')
 
+    def train_batches(self, batches: Iterator[Ragged]) -> None:
+        """
+        Same as train, but the expressions are provided in batches (see
+        deepchall.ragged), some of which can be empty. Networks able to
+        train on whole batches should override this method, by default the
+        batches are split into expressions passed to train.
+        """
+        self.train(gen=(sample for batch in batches for sample in batch))
+
+    def train_corpus(self, corpus: Corpus) -> None:
+        """
+        Same as train, but the expressions are read from a corpus stored
+        on disk (see deepchall.corpus), which can be larger than the memory.
+        Networks able to train on mini-batches should override this method,
+        by default the corpus is simply streamed to train.
+        """
+        self.train(gen=iter(corpus))
+
     def gen(self) -> np.array:
         """
         This method is called after training has completed. It should
@@ -69,3 +98,11 @@ class Net:
         (potentially many times).
         """
         raise NotImplementedError('Method gen is not implemented')
+
+    def gen_batch(self, num: int) -> Ragged:
+        """
+        Same as gen, but generates num expressions at once. Networks able
+        to generate in batches should override this method.
+        """
+        return Ragged.from_samples(
+            [self.gen() for _ in range(num)], dtype=self._params['dtype'])
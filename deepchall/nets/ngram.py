@@ -0,0 +1,160 @@
+from .net import Net, UnsupportedNetParamError
+from ..ragged import Ragged, batched
+from ..corpus import Corpus
+import numpy as np
+from typing import Dict, Generator, Iterator
+
+class NGram(Net):
+    name = 'ngram'
+
+    desc = """
+    A count-based n-gram model with add-alpha smoothing, implemented with
+    NumPy only. Trains in a single pass over the samples, meant as a fast
+    baseline for the other nets
+    """
+
+    extra_params = {
+        'order': ('Length of the n-grams, i.e. contexts of order-1 tokens', 3),
+        'alpha': ('Add-alpha smoothing applied to the counts', 0.01),
+        'gen_batch_size': ('Number of expressions generated at once', 100),
+        'seed': ('Seed of the random generator, None for a random seed', None),
+    }
+
+    # Counting is done in a single pass
+    ignored_lang_params = ('epochs',)
+
+    """
+    Maximum number of entries of the counts table
+    """
+    max_table_size = 2**26
+
+    """
+    Number of samples counted at once during training
+    """
+    train_batch_size = 1024
+
+    def __init__(self):
+        self._params = None
+        self._order = None
+        self._alphabet_size = None
+        self._length = None
+        self._counts = None
+        self._cdf = None
+        self._rng = None
+        self._buffer = None
+        self._buffer_pos = 0
+
+    def init(self, params: Dict) -> None:
+        self._params = params
+        self._order = params['order']
+        if self._order < 1:
+            raise UnsupportedNetParamError('order')
+        if params['gen_batch_size'] < 1:
+            raise UnsupportedNetParamError('gen_batch_size')
+
+        # Token 0 marks both the beginning and the end of the expr,
+        # language tokens are shifted by one
+        self._alphabet_size = params['alphabet_size']+1
+        self._length = params['max_length']
+
+        num_contexts = self._alphabet_size**(self._order-1)
+        if num_contexts*self._alphabet_size > NGram.max_table_size:
+            raise UnsupportedNetParamError('order')
+
+        self._counts = np.zeros(
+            (num_contexts, self._alphabet_size), dtype=np.int64)
+        self._rng = np.random.default_rng(params['seed'])
+        self._buffer = None
+        self._buffer_pos = 0
+
+    def _context_ids(self, tokens: np.array) -> np.array:
+        """
+        Takes a 1-D array of tokens and returns, for every position i such that
+        i >= order-1, the id of the context formed by the order-1 tokens
+        preceding i.
+        """
+        ids = np.zeros(len(tokens)-self._order+1, dtype=np.int64)
+        for k in range(self._order-1):
+            ids = ids*self._alphabet_size + tokens[k:len(tokens)-self._order+1+k]
+        return ids
+
+    def _count(self, batch: Ragged) -> None:
+        """
+        Update the counts with a batch of samples, all at once
+        """
+        pad = self._order-1
+        lengths = batch.lengths()
+
+        # Each sample becomes [0]*(order-1) + (sample+1) + [0], only the
+        # sample tokens and its end marker are targets, not the padding
+        n = len(batch)
+        tokens = np.zeros(len(batch.values) + n*(pad+1), dtype=np.int64)
+        tokens[np.repeat(np.arange(n)*(pad+1) + pad, lengths) +
+               np.arange(len(batch.values))] = batch.values.astype(np.int64) + 1
+        is_target = np.zeros(len(tokens), dtype=bool)
+        is_target[np.repeat(np.arange(n)*pad + pad, lengths+1) +
+                  np.arange(len(batch.values) + n)] = True
+        is_target = is_target[pad:]
+
+        ctx = self._context_ids(tokens)[is_target]
+        np.add.at(self._counts, (ctx, tokens[pad:][is_target]), 1)
+
+    def _finish_training(self, max_seen: int) -> None:
+        # Without a max_length, don't generate anything longer than
+        # what was seen during training
+        if self._length is None:
+            self._length = max_seen
+
+        probs = self._counts + self._params['alpha']
+        probs = probs / probs.sum(axis=1, keepdims=True)
+        self._cdf = np.cumsum(probs, axis=1)
+
+    def train(self, gen: Generator[np.array, None, None]) -> None:
+        self.train_batches(
+            Ragged.from_samples(samples, dtype=np.int64)
+            for samples in batched(gen, NGram.train_batch_size))
+
+    def train_batches(self, batches: Iterator[Ragged]) -> None:
+        max_seen = 0
+        for batch in batches:
+            if len(batch) == 0:
+                continue
+            self._count(batch)
+            max_seen = max(max_seen, batch.lengths().max())
+        self._finish_training(max_seen)
+
+    def train_corpus(self, corpus: Corpus) -> None:
+        self.train_batches(
+            corpus.take(np.arange(i, min(i+NGram.train_batch_size, len(corpus))))
+            for i in range(0, len(corpus), NGram.train_batch_size))
+
+    def gen_batch(self, num: int) -> Ragged:
+        exprs = np.zeros((num, self._length), dtype=np.int64)
+        ctx = np.zeros(num, dtype=np.int64)
+        lengths = np.full(num, self._length)
+        done = np.zeros(num, dtype=bool)
+        num_contexts = self._cdf.shape[0]
+
+        for i in range(self._length):
+            u = self._rng.random(num)
+            preds = (self._cdf[ctx] < u[:,None]).sum(axis=1)
+            # Guard against rounding errors in the cdf
+            preds = np.minimum(preds, self._alphabet_size-1)
+
+            # A zero marks the end of the expr
+            ended = ~done & (preds == 0)
+            lengths[ended] = i
+            done |= ended
+            exprs[:,i] = preds
+
+            if self._order > 1:
+                ctx = (ctx*self._alphabet_size + preds) % num_contexts
+
+        return Ragged.from_padded(exprs-1, lengths, dtype=self._params['dtype'])
+
+    def gen(self) -> np.array:
+        if self._buffer is None or self._buffer_pos == len(self._buffer):
+            self._buffer = self.gen_batch(self._params['gen_batch_size'])
+            self._buffer_pos = 0
+        self._buffer_pos += 1
+        return self._buffer[self._buffer_pos-1]
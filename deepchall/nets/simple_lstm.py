@@ -1,8 +1,10 @@
 from .net import Net, UnsupportedNetParamError
+from ..corpus import Corpus
 import numpy as np
 import tensorflow as tf 
-from typing import Dict, Generator
-from .utils import zero_pad_to_length, sample_categorical
+from typing import Dict, Generator, Iterator
+from ..ragged import Ragged
+from .utils import sample_categorical, configure_threading
 
 class SimpleLSTM(Net):
     name = 'simple_lstm'
@@ -11,12 +13,35 @@ class SimpleLSTM(Net):
     A single-layer LSTM trained to predict 
     """
 
-    net_params = {
+    extra_params = {
         'units': ('Number of units in the LSTM layer', 30),
+        'batch_size': ('Size of the training mini-batches', 20),
+        'intra_op_threads': (
+            'Threads used to run a single op, 0 lets TensorFlow decide. '
+            'Shared by all nets in the process', 0
+        ),
+        'inter_op_threads': (
+            'Threads used to run independent ops in parallel, 0 lets '
+            'TensorFlow decide. Shared by all nets in the process', 0
+        ),
+        'graph_mode': (
+            'Compile the train and generation steps with tf.function', True
+        ),
+        'jit_compile': (
+            'Compile the train and generation steps with XLA '
+            '(requires graph_mode)', False
+        ),
+        'precision': (
+            "Either 'float32' or 'mixed_bfloat16' (mixed precision, "
+            "only pays off on CPUs with native bfloat16 support)", 'float32'
+        ),
     }
 
+    precisions = ('float32', 'mixed_bfloat16')
+
     def __init__(self):
         self._model = None
+        self._gen_step = None
         self._params = None
         self._length = None
         self._alphabet_size = None
@@ -25,6 +50,19 @@ class SimpleLSTM(Net):
         self._params = params
         if params['max_length'] is None:
             raise UnsupportedNetParamError('max_length')
+        if params['precision'] not in SimpleLSTM.precisions:
+            raise UnsupportedNetParamError('precision')
+        if params['jit_compile'] and not params['graph_mode']:
+            raise UnsupportedNetParamError('jit_compile')
+
+        # Thread pools can only be sized before TF runs its first op
+        if not configure_threading(
+            intra_op_threads=params['intra_op_threads'],
+            inter_op_threads=params['inter_op_threads']):
+            print(
+                "[!] Warning - TensorFlow already initialized, "
+                "ignoring intra_op_threads and inter_op_threads"
+            )
 
         self._length = params['max_length']+1
         self._alphabet_size = params['alphabet_size']+1
@@ -33,25 +71,58 @@ class SimpleLSTM(Net):
             self._length,
             self._alphabet_size,
         )
+        self._gen_step = self._make_gen_step()
 
     def _make_model(self, length: int, alphabet_size: int):
+        dtype = self._params['precision']
         X = tf.keras.layers.Input(shape=(length, alphabet_size))
         tmp = tf.keras.layers.LSTM(
             self._params['units'], 
-            return_sequences=True)(X)
-        tmp = tf.keras.layers.Dense(alphabet_size, activation='softmax')(tmp)
+            return_sequences=True,
+            dtype=dtype)(X)
+        tmp = tf.keras.layers.Dense(alphabet_size, dtype=dtype)(tmp)
+        # Keep the softmax in float32 for numerical stability
+        tmp = tf.keras.layers.Activation('softmax', dtype='float32')(tmp)
         model = tf.keras.Model(inputs=[X],outputs=[tmp])
-        model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
+        model.compile(
+            optimizer='adam', 
+            loss='categorical_crossentropy', 
+            metrics=['accuracy'],
+            run_eagerly=not self._params['graph_mode'],
+            jit_compile=self._params['jit_compile'],
+        )
         return model
 
-    def train(self, gen: Generator[np.array, None, None]) -> None:
-        tmp = zero_pad_to_length(list(gen), length=self._length-1, axis=1)
-
+    def _make_gen_step(self):
+        """
+        Returns a function that, given a (1, length) tensor of tokens and a
+        position i, samples the token following position i. The input always
+        has the same shape so that the step is traced only once.
+        """
+        def step(tokens, i):
+            X = tf.one_hot(
+                indices=tokens, 
+                depth=self._alphabet_size, 
+                on_value=1., 
+                off_value=0.,
+            )
+            preds = self._model(X, training=False)
+            return sample_categorical(preds[:,i,:], temperature=1.0, num_samples=1)
+
+        if self._params['graph_mode']:
+            step = tf.function(step, jit_compile=self._params['jit_compile'])
+        return step
+
+    def _make_xy(self, tmp):
+        """
+        Takes a batch of exprs, shifted by one and zero padded to length-1,
+        and returns the one-hot encoded inputs and targets of the model
+        """
         # X starts with a zero indicating the beginning of the expr
-        X = np.pad(tmp, [(0,0),(1,0)], 'constant', constant_values=0)
+        X = tf.pad(tmp, [(0,0),(1,0)], 'constant', constant_values=0)
 
         # Y is like X but one step ahead and zero padded
-        Y = np.pad(tmp, [(0,0),(0,1)], 'constant', constant_values=0)
+        Y = tf.pad(tmp, [(0,0),(0,1)], 'constant', constant_values=0)
 
         # Use one-hot encoding
         X = tf.one_hot(
@@ -66,43 +137,66 @@ class SimpleLSTM(Net):
             on_value=1., 
             off_value=0.,
         )
+        return X, Y
+
+    def train(self, gen: Generator[np.array, None, None]) -> None:
+        self.train_batches(
+            [Ragged.from_samples(list(gen), dtype=self._params['dtype'])])
+
+    def train_batches(self, batches: Iterator[Ragged]) -> None:
+        # Padding becomes zero, tokens are shifted by one
+        tmp = np.concatenate(
+            [np.zeros((0, self._length-1), dtype=np.int64)] +
+            [batch.padded(length=self._length-1, pad_value=-1) + 1
+             for batch in batches])
+        X, Y = self._make_xy(tmp)
 
         self._model.fit(
             x=X, 
             y=Y, 
             epochs=self._params['epochs'], 
-            batch_size=20, 
+            batch_size=self._params['batch_size'], 
             verbose=0,
         )
 
-    def gen(self) -> np.array:
-        X = tf.one_hot(
-            indices=[[0,]], 
-            depth=self._alphabet_size, 
-            on_value=1., 
-            off_value=0.,
+    def train_corpus(self, corpus: Corpus) -> None:
+        # Only one mini-batch at a time is loaded from the corpus,
+        # reshuffled at every epoch
+        def batches():
+            for batch in corpus.batches(
+                batch_size=self._params['batch_size'],
+                length=self._length-1):
+                # Padding becomes zero, tokens are shifted by one
+                yield batch+1
+
+        dataset = tf.data.Dataset.from_generator(
+            batches,
+            output_signature=tf.TensorSpec(
+                shape=(None, self._length-1), dtype=tf.int64),
         )
-        for _ in range(self._length):
-            preds = self._model(X)
-            preds = sample_categorical(preds[:,-1,:], temperature=1.0, num_samples=1)
-            preds = tf.one_hot(
-                indices=preds, 
-                depth=self._alphabet_size, 
-                on_value=1., 
-                off_value=0.,
-            )
-            X = tf.concat([X,preds],1)
+        dataset = dataset.map(self._make_xy).prefetch(tf.data.AUTOTUNE)
 
-        # From one-hot back to int representation
-        X = tf.argmax(X, axis=2)
-
-        # Remove initial zero 
-        X = X[:, 1:]
+        self._model.fit(
+            dataset, 
+            epochs=self._params['epochs'], 
+            verbose=0,
+        )
 
-        # Ignore all elements from the first zero 
-        for i in range(X.shape[1]):
-            if X[0,i] == 0:
-                X = X[:,:i]
+    def gen(self) -> np.array:
+        # Tokens fed to the model, starting with a zero indicating the
+        # beginning of the expr. The LSTM is causal, so positions not yet
+        # generated do not affect the predictions for earlier ones.
+        # At most max_length tokens are generated, i.e. length-1.
+        tokens = np.zeros((1, self._length), dtype=np.int32)
+        expr = []
+        for i in range(self._length-1):
+            pred = int(self._gen_step(tf.constant(tokens), tf.constant(i))[0,0])
+
+            # A zero marks the end of the expr
+            if pred == 0:
                 break
-        X -= 1
-        return X.numpy()
\ No newline at end of file
+            expr.append(pred)
+            tokens[0,i+1] = pred
+
+        return (np.array(expr, dtype=np.int64) - 1).astype(
+            self._params['dtype']).reshape(1, -1)
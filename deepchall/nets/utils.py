@@ -27,6 +27,25 @@ def zero_pad_to_length(arrays: List[np.array], length: int, axis: int = 1):
 def sample_categorical(preds, temperature: float = 1.0, num_samples: int = 1):
     preds = tf.math.log(preds)/temperature
     return tf.random.categorical(preds,num_samples=num_samples)
+
+def configure_threading(intra_op_threads: int = 0, inter_op_threads: int = 0) -> bool:
+    """
+    Set the size of TensorFlow's intra-op and inter-op thread pools, 0 means
+    that TensorFlow picks the value. The thread pools are global to the
+    process and can only be configured before the runtime is initialized
+    (i.e. before running any op), returns False if it was too late to
+    apply the requested configuration.
+    """
+    threading = tf.config.threading
+    if (threading.get_intra_op_parallelism_threads() == intra_op_threads and
+        threading.get_inter_op_parallelism_threads() == inter_op_threads):
+        return True
+    try:
+        threading.set_intra_op_parallelism_threads(intra_op_threads)
+        threading.set_inter_op_parallelism_threads(inter_op_threads)
+    except RuntimeError:
+        return False
+    return True
  
 #def generate(
 #    model: keras.Model, 
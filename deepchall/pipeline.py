@@ -0,0 +1,168 @@
+import multiprocessing
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional
+
+from .ragged import Ragged
+
+class _Done:
+    """
+    Last item sent by a producer, carrying the exception that stopped it,
+    if any
+    """
+    def __init__(self, error: Optional[BaseException] = None):
+        self.error = error
+
+def _put(items, item, stop, stall_time) -> bool:
+    """
+    Puts item in the items queue, waiting while the queue is full unless
+    stop is set. Returns False if the item was dropped because of stop.
+    The time spent blocked is added to stall_time.
+    """
+    start_time = time.time()
+    try:
+        while True:
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                if stop.is_set():
+                    return False
+    finally:
+        with stall_time.get_lock():
+            stall_time.value += time.time() - start_time
+
+def _produce(make_gen: Callable[[], Iterator], items, stop, stall_time) -> None:
+    """
+    Puts the items of make_gen() in the items queue until the generator is
+    exhausted or stop is set, followed by a _Done item. The time spent
+    blocked on the full queue is added to stall_time, a shared
+    multiprocessing.Value.
+    """
+    try:
+        for item in make_gen():
+            if not _put(items, item, stop, stall_time):
+                break
+        else:
+            # The consumer can be gone while the queue is full
+            _put(items, _Done(), stop, stall_time)
+    except Exception as e:
+        _put(items, _Done(error=e), stop, stall_time)
+
+    # Don't wait for a consumer that is gone to flush the queue
+    if stop.is_set() and hasattr(items, 'cancel_join_thread'):
+        items.cancel_join_thread()
+
+def lang_batches(lang_config: Dict, batch_size: int,
+                 max_length: Optional[int] = None) -> Iterator[Ragged]:
+    """
+    Builds the language described by lang_config and yields batches of its
+    samples. Used to generate samples in another process, where rebuilding
+    the language is cheaper than pickling its backend. Only the langs are
+    imported, not the nets and their dependencies.
+    """
+    from .langs.index import LANGS
+    lang = LANGS[lang_config['lang']]()
+    lang.init(params=lang_config)
+    return lang.get().gen_batches(batch_size, max_length=max_length)
+
+class Prefetcher:
+    """
+    Runs a generator in a background thread (or process) and yields its items
+    through a queue of at most max_queue items. The producer blocks while the
+    queue is full, so it is never more than max_queue items ahead.
+
+    make_gen is called in the background to get the generator, in process
+    mode it must be picklable (e.g. a functools.partial of lang_batches).
+
+    When closed, the following stats are stored in the stats dict:
+    - queue_max_depth: the largest number of items found waiting in the queue
+    - queue_avg_depth: average number of items found waiting in the queue
+    - consumer_stall_time: time spent waiting for the producer, i.e.
+      generation time that was not hidden
+    - producer_stall_time: time the producer spent blocked on a full queue
+
+    Example of usage:
+      batches = Prefetcher(partial(bkd.gen_batches, 256), max_queue=16)
+      try:
+        for batch in batches:
+          ...
+      finally:
+        batches.close()
+    """
+    modes = ('thread', 'process')
+
+    def __init__(self, make_gen: Callable[[], Iterator], max_queue: int,
+                 mode: str = 'thread', stats: Optional[Dict] = None):
+        if mode not in Prefetcher.modes:
+            raise ValueError(f'Unknown pipeline mode {mode}')
+        if max_queue < 1:
+            raise ValueError('The queue size must be > 0')
+
+        self._stats = stats if stats is not None else {}
+        self._max_depth = 0
+        self._sum_depths = 0
+        self._num_gets = 0
+        self._consumer_stall_time = 0.
+        self._done = False
+
+        # Forking a process that already started TensorFlow is unsafe
+        ctx = multiprocessing.get_context('spawn')
+        self._producer_stall_time = ctx.Value('d', 0.)
+        if mode == 'thread':
+            self._items = queue.Queue(maxsize=max_queue)
+            self._stop = threading.Event()
+            worker = threading.Thread
+        else:
+            self._items = ctx.Queue(maxsize=max_queue)
+            self._stop = ctx.Event()
+            worker = ctx.Process
+        self._worker = worker(
+            target=_produce,
+            args=(make_gen, self._items, self._stop, self._producer_stall_time),
+            daemon=True,
+        )
+        self._worker.start()
+
+    def __iter__(self) -> "Prefetcher":
+        return self
+
+    def __next__(self):
+        if self._done:
+            raise StopIteration
+
+        try:
+            depth = self._items.qsize()
+        except NotImplementedError:
+            # Not available on some platforms in process mode
+            depth = 0
+        self._max_depth = max(self._max_depth, depth)
+        self._sum_depths += depth
+        self._num_gets += 1
+
+        start_time = time.time()
+        item = self._items.get()
+        self._consumer_stall_time += time.time() - start_time
+
+        if isinstance(item, _Done):
+            self._done = True
+            self.close()
+            if item.error is not None:
+                raise item.error
+            raise StopIteration
+        return item
+
+    def close(self) -> None:
+        """
+        Stops the producer and stores the stats
+        """
+        self._stop.set()
+        self._worker.join(timeout=1)
+        if isinstance(self._worker, multiprocessing.process.BaseProcess) and self._worker.is_alive():
+            self._worker.terminate()
+
+        self._stats['queue_max_depth'] = self._max_depth
+        self._stats['queue_avg_depth'] = self._sum_depths / max(self._num_gets, 1)
+        self._stats['consumer_stall_time'] = self._consumer_stall_time
+        self._stats['producer_stall_time'] = self._producer_stall_time.value
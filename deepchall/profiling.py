@@ -0,0 +1,141 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+try:
+    from pyinstrument import Profiler as SamplingProfiler
+except ImportError:
+    SamplingProfiler = None
+
+class Profiler:
+    """
+    Profiles the phases of a run (e.g. training, testing). For each phase it
+    records the peak memory allocated by Python (including NumPy arrays) with
+    tracemalloc and profiles the CPU time, either with cProfile or, if
+    sampling is True, with pyinstrument's sampling profiler.
+
+    For every phase of a run, a profile dump is written in output_dir along
+    with a summary of the top hotspots shared by all the phases of the run:
+      <output_dir>/<run>_<phase>.prof (or .html when sampling)
+      <output_dir>/<run>_summary.txt
+
+    A Profiler without output_dir does nothing, so that the phases can be
+    wrapped unconditionally.
+
+    With cProfile, the threads started during a phase (e.g. the producer of
+    a 'thread' pipeline) are profiled too and merged in the phase profile.
+    pyinstrument only samples the thread running the phase, and samples
+    generated in another process (a 'process' pipeline) are never profiled.
+
+    Example of usage:
+      profiler = Profiler('profiles')
+      with profiler.phase('fsm_lstm', 'training', stats):
+        net.train(gen)
+    """
+    def __init__(self, output_dir: Optional[str] = None, top: int = 20,
+                 sampling: bool = False):
+        if sampling and SamplingProfiler is None:
+            raise ValueError('Sampling profiler requires pyinstrument')
+        self._output_dir = output_dir
+        self._top = top
+        self._sampling = sampling
+        # Runs whose summary has already been started
+        self._runs = set()
+        # Profiles of the threads started during the current phase
+        self._thread_profiles = []
+        if output_dir is not None:
+            os.makedirs(output_dir, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self._output_dir is not None
+
+    @contextmanager
+    def phase(self, run: str, phase: str, stats: Dict):
+        """
+        Profiles the code executed within the context, and stores the peak
+        memory of the phase in stats['peak_memory_<phase>'] (in bytes)
+        """
+        if not self.enabled:
+            yield
+            return
+
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        base_memory, _ = tracemalloc.get_traced_memory()
+
+        if self._sampling:
+            prof = SamplingProfiler()
+            prof.start()
+        else:
+            prof = cProfile.Profile()
+            self._thread_profiles = []
+            threading.setprofile(self._profile_thread)
+            prof.enable()
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            if self._sampling:
+                prof.stop()
+            else:
+                prof.disable()
+                threading.setprofile(None)
+            elapsed = time.time() - start_time
+            _, peak_memory = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+
+            stats[f'peak_memory_{phase}'] = peak_memory - base_memory
+            self._dump(run, phase, prof, elapsed, peak_memory - base_memory)
+
+    def _profile_thread(self, frame, event, arg) -> None:
+        """
+        Called on the first event of every thread started during a phase,
+        profiles the thread from then on
+        """
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:
+            # Since Python 3.12 a single profile covers all the threads
+            sys.setprofile(None)
+            return
+        self._thread_profiles.append(prof)
+
+    def _dump(self, run: str, phase: str, prof, elapsed: float, peak_memory: int) -> None:
+        path = os.path.join(self._output_dir, f'{run}_{phase}')
+        if self._sampling:
+            with open(path+'.html', 'w') as fd:
+                fd.write(prof.output_html())
+            hotspots = prof.output_text(unicode=False, color=False)
+        else:
+            out = io.StringIO()
+            prof_stats = pstats.Stats(prof, stream=out)
+            for thread_prof in self._thread_profiles:
+                prof_stats.add(thread_prof)
+            self._thread_profiles = []
+            prof_stats.dump_stats(path+'.prof')
+            prof_stats.sort_stats('tottime').print_stats(self._top)
+            hotspots = out.getvalue()
+
+        # The summary is overwritten by the first phase of every run
+        summary_path = os.path.join(self._output_dir, f'{run}_summary.txt')
+        mode = 'a' if run in self._runs else 'w'
+        self._runs.add(run)
+        with open(summary_path, mode) as fd:
+            fd.write(f'=== {phase}\n')
+            fd.write(f'time: {elapsed:.3f}s\n')
+            fd.write(f'peak memory: {peak_memory} bytes\n')
+            fd.write(hotspots)
+            fd.write('\n')
+        print(f"[*] Profile of {phase} written to {path}")
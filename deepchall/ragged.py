@@ -0,0 +1,130 @@
+import itertools
+import numpy as np
+from typing import Optional, Generator, Iterable, Sequence, List
+
+def compact_dtype(alphabet_size: int) -> np.dtype:
+    """
+    Returns the smallest unsigned integer type able to represent values v
+    where 0 <= v < alphabet_size
+    """
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if alphabet_size <= np.iinfo(dtype).max+1:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+class Ragged:
+    """
+    A batch of samples of shape (1, N) with possibly different lengths N,
+    stored as two flat arrays:
+    - values: all the samples concatenated
+    - offsets: int64 array of len(batch)+1 elements, sample i spans
+      values[offsets[i]:offsets[i+1]]
+
+    Example of usage:
+      batch = Ragged.from_lists([[0, 1], [], [2]], dtype=np.uint8)
+      batch.lengths() # [2, 0, 1]
+      batch[0]        # array([[0, 1]], dtype=uint8)
+    """
+    def __init__(self, values: np.array, offsets: np.array):
+        self.values = values
+        self.offsets = offsets
+
+    @staticmethod
+    def from_lists(exprs: Sequence[Sequence[int]], dtype: np.dtype) -> "Ragged":
+        lengths = np.fromiter(map(len, exprs), dtype=np.int64, count=len(exprs))
+        offsets = np.zeros(len(exprs)+1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        values = np.fromiter(
+            itertools.chain.from_iterable(exprs), dtype=dtype, count=offsets[-1])
+        return Ragged(values, offsets)
+
+    @staticmethod
+    def from_samples(samples: Sequence[np.array], dtype: np.dtype) -> "Ragged":
+        lengths = np.array([s.shape[1] for s in samples], dtype=np.int64)
+        offsets = np.zeros(len(samples)+1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        if len(samples):
+            values = np.concatenate([s[0] for s in samples]).astype(dtype)
+        else:
+            values = np.zeros(0, dtype=dtype)
+        return Ragged(values, offsets)
+
+    @staticmethod
+    def from_padded(padded: np.array, lengths: np.array, dtype: np.dtype) -> "Ragged":
+        """
+        Takes a (B, L) array where row i holds a sample of length lengths[i]
+        followed by padding
+        """
+        offsets = np.zeros(len(lengths)+1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        mask = np.arange(padded.shape[1]) < np.asarray(lengths)[:,None]
+        return Ragged(padded[mask].astype(dtype), offsets)
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.values.dtype
+
+    def __len__(self) -> int:
+        return len(self.offsets)-1
+
+    def __getitem__(self, i: int) -> np.array:
+        """
+        Returns sample i as a (1, N) view on the values
+        """
+        if not -len(self) <= i < len(self):
+            raise IndexError('Sample index out of range')
+        i %= len(self)
+        return self.values[self.offsets[i]:self.offsets[i+1]].reshape(1, -1)
+
+    def __iter__(self) -> Generator[np.array, None, None]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def lengths(self) -> np.array:
+        return np.diff(self.offsets)
+
+    def take(self, indices: np.array) -> "Ragged":
+        """
+        Returns a new batch with the samples at the given indices (or at the
+        True positions of a boolean mask)
+        """
+        indices = np.asarray(indices)
+        if indices.dtype == bool:
+            indices = np.flatnonzero(indices)
+        starts = self.offsets[indices]
+        lengths = self.offsets[indices+1] - starts
+        offsets = np.zeros(len(indices)+1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        # Positions of all the requested values, sample after sample
+        positions = (np.repeat(starts - offsets[:-1], lengths) +
+                     np.arange(offsets[-1]))
+        return Ragged(self.values[positions], offsets)
+
+    def padded(self, length: Optional[int] = None, pad_value: int = -1) -> np.array:
+        """
+        Returns the samples as a (len(self), length) int64 array, padded with
+        pad_value. If length is None the samples are padded to the longest one.
+        """
+        lengths = self.lengths()
+        if length is None:
+            length = int(lengths.max()) if len(lengths) else 0
+        elif len(lengths) and lengths.max() > length:
+            raise ValueError(
+                f'Trying to pad to length {length} samples of length {lengths.max()}')
+
+        padded = np.full((len(self), length), pad_value, dtype=np.int64)
+        padded[np.arange(length) < lengths[:,None]] = self.values
+        return padded
+
+def batched(iterable: Iterable, batch_size: int) -> Generator[List, None, None]:
+    """
+    Splits an iterable in lists of batch_size elements (the last one can be
+    shorter)
+    """
+    it = iter(iterable)
+    while True:
+        batch = list(itertools.islice(it, batch_size))
+        if not batch:
+            return
+        yield batch
@@ -1,11 +1,21 @@
 import json
+import os
+import tempfile
 import time
 from .index import INDEX
 from .backends.backend import ShapePlaceholder
 from .nets.net import Net
 from .langs.lang import Lang
-from typing import Dict
-from tqdm import tqdm, trange
+from .corpus import Corpus, CorpusWriter
+from .profiling import Profiler
+from .pipeline import Prefetcher, lang_batches
+from .dedup import make_sample_set, ExactSampleSet
+from functools import partial
+from typing import Dict, Optional, List, Any, Generator, Tuple
+from .ragged import Ragged
+import itertools
+from tqdm import tqdm
+import numpy as np
 
 class Runner:
 
@@ -16,15 +26,65 @@ class Runner:
         "max_length": None, 
         "epochs": 10,
         "test_samples": 100,
+        # Directory where to store the training samples, if set nets
+        # train from this corpus instead of the in-memory samples. Every
+        # distinct set of training samples (see Runner.plan) is stored in
+        # its own subdirectory, named after the first lang using it.
+        "corpus": None,
+        # If set to 'thread' or 'process' samples are generated in the
+        # background, at most pipeline_queue_size batches ahead
+        "pipeline": None,
+        "pipeline_queue_size": 16,
+        # Training samples are tracked to compute duplicates and novelty
+        # stats, either in an 'exact' set (a copy of every sample) or in a
+        # 'bloom' filter of fixed size with the given error rate. 'auto'
+        # picks bloom when corpus is set or max_samples is large (see
+        # sample_set_kind). If dedup is True duplicated training samples are
+        # dropped, with bloom about error_rate of the unique samples are
+        # wrongly seen as duplicates and silently dropped as well.
+        "dedup": False,
+        "sample_set": "auto",
+        "sample_set_error_rate": 0.001,
     }
 
     default_backend_params = {}
 
-    def __init__(self, config_path: str):
+    """
+    Lang params that only affect the training (resp. the testing) of the
+    nets. Runs that differ only in these params share the generation of the
+    training samples (resp. the training of the net). Nets can also list
+    lang params that don't affect their training in ignored_lang_params.
+    """
+    training_lang_params = ('epochs',)
+    testing_lang_params = ('test_samples',)
+
+    """
+    Number of samples exchanged at once between backends, nets and corpora
+    """
+    batch_size = 256
+
+    """
+    Largest max_samples for which the 'auto' sample set keeps an exact copy
+    of the training samples
+    """
+    max_exact_samples = 100000
+
+    """
+    Largest max_samples for which training samples shared by several nets
+    are kept in memory, larger sets are written to a temporary corpus
+    """
+    max_cached_samples = 100000
+
+    def __init__(self, config_path: str, profiler: Optional[Profiler] = None):
         with open(config_path) as fd:
             config = json.load(fd)
 
-        self._check_config(config)
+        # Profiles the phases of every run, disabled by default
+        if profiler is None:
+            profiler = Profiler()
+        self._profiler = profiler
+
+        config = self._check_config(config)
 
         # Init langs config
         self._langs_config = {}
@@ -72,7 +132,84 @@ class Runner:
             unpacked_params[k] = v[1]
         return unpacked_params
 
-    def _check_config(self, config: Dict):
+    @staticmethod
+    def sweep_values(value: Any) -> Optional[List]:
+        """
+        Returns the list of values of a swept param, or None if the param is
+        not swept. A param can be swept either by listing its values:
+            {"sweep": [10, 20, 50]}
+        or with a range (stop excluded, step defaults to 1):
+            {"range": [10, 50, 20]}
+        """
+        if not isinstance(value, dict) or len(value) != 1:
+            return None
+        if 'sweep' in value:
+            if not isinstance(value['sweep'], list) or not value['sweep']:
+                raise ValueError('Expected a non-empty list of values to sweep')
+            return value['sweep']
+        if 'range' in value:
+            if not isinstance(value['range'], list) or not 2 <= len(value['range']) <= 3:
+                raise ValueError('Expected [start, stop] or [start, stop, step] as range')
+            start, stop, step = (value['range'] + [1])[:3]
+            if step <= 0:
+                raise ValueError('The step of a range must be > 0')
+            values = []
+            while start < stop:
+                values.append(start)
+                start += step
+            return values
+        return None
+
+    @staticmethod
+    def expand_sweeps(entries: Dict[str, Dict], fixed: Tuple[str, ...] = ()) -> Dict[str, Dict]:
+        """
+        Expands every entry containing swept params (see sweep_values) into
+        one entry per combination of their values, named after the values:
+            {"net": {"net": "simple_lstm", "units": {"sweep": [10, 20]}}}
+        becomes:
+            {"net[units=10]": {"net": "simple_lstm", "units": 10},
+             "net[units=20]": {"net": "simple_lstm", "units": 20}}
+        The params listed in fixed cannot be swept.
+        """
+        expanded = {}
+        for name, params in entries.items():
+            swept = {}
+            for k, v in params.items():
+                values = Runner.sweep_values(v)
+                if values is not None:
+                    if k in fixed:
+                        raise ValueError(f'Param {k} cannot be swept')
+                    swept[k] = values
+
+            if not swept:
+                expanded[name] = params
+                continue
+
+            for combination in itertools.product(*swept.values()):
+                values = dict(zip(swept.keys(), combination))
+                suffix = ','.join(f'{k}={v}' for k, v in values.items())
+                expanded[f'{name}[{suffix}]'] = {**params, **values}
+        return expanded
+
+    @staticmethod
+    def sample_set_kind(lang_config: Dict) -> str:
+        """
+        Returns the kind of set tracking the training samples. With 'auto',
+        samples stored in a corpus (meant for sets that don't fit in memory)
+        or more than max_exact_samples of them are tracked in a Bloom filter.
+        """
+        kind = lang_config['sample_set']
+        if kind != 'auto':
+            return kind
+        if (lang_config['corpus'] is not None or
+            lang_config['max_samples'] > Runner.max_exact_samples):
+            return 'bloom'
+        return 'exact'
+
+    def _check_config(self, config: Dict) -> Dict:
+        """
+        Validates the config and returns it with its sweeps expanded
+        """
         if 'langs' not in config:
             raise ValueError('Missing langs key in config')
         if 'nets' not in config:
@@ -82,6 +219,13 @@ class Runner:
         if not isinstance(config['nets'], dict):
             raise ValueError('Expected a dict for nets key in config')
 
+        # The names are checked once expanded, so that sweeping lang or net
+        # is reported as such
+        config = {
+            'langs': Runner.expand_sweeps(config['langs'], fixed=('lang',)),
+            'nets': Runner.expand_sweeps(config['nets'], fixed=('net',)),
+        }
+
         for val in config['langs'].values():
             if val['lang'] not in INDEX['langs']:
                 raise ValueError('Unknown language '+val['lang'])
@@ -90,123 +234,314 @@ class Runner:
             if val['net'] not in INDEX['nets']:
                 raise ValueError('Unknown net'+val['net'])
 
-    # TODO: this function is insanely long, it needs some refactoring
-    def _run_net(self, lang_name: str, net_name: str):
+        return config
+
+    @staticmethod
+    def _key(params: Dict, excluded: Tuple[str, ...] = ()) -> str:
+        return json.dumps(
+            {k: v for k, v in params.items() if k not in excluded},
+            sort_keys=True,
+            default=str,
+        )
+
+    def plan(self) -> List[Dict]:
+        """
+        Groups the (lang, net) runs so that the work they have in common is
+        done once. Returns a list of generation jobs, one per distinct set of
+        lang params affecting the training samples:
+        {
+            'lang_names': langs sharing the training samples,
+            'lang_config': params of the first of these langs,
+            'trainings': [
+                {
+                    'net_name': net to train,
+                    'lang_config': lang params used for training,
+                    'runs': [(lang_name, net_name), ...] to evaluate,
+                },
+                ...
+            ],
+        }
+        """
+        jobs = {}
+        for lang_name, lang_config in self._langs_config.items():
+            gen_key = Runner._key(
+                lang_config,
+                Runner.training_lang_params + Runner.testing_lang_params,
+            )
+            job = jobs.setdefault(gen_key, {
+                'lang_names': [],
+                'lang_config': lang_config,
+                'trainings': {},
+            })
+            job['lang_names'].append(lang_name)
+
+            for net_name, net_config in self._nets_config.items():
+                net = INDEX['nets'][net_config['net']]
+                train_key = Runner._key(
+                    {**lang_config, **net_config},
+                    Runner.testing_lang_params + tuple(net.ignored_lang_params),
+                )
+                training = job['trainings'].setdefault(train_key, {
+                    'net_name': net_name,
+                    'lang_config': lang_config,
+                    'runs': [],
+                })
+                training['runs'].append((lang_name, net_name))
+
+        plan = []
+        for job in jobs.values():
+            job['trainings'] = list(job['trainings'].values())
+            plan.append(job)
+        return plan
+
+    def _gen_batches(self, lang_config: Dict, bkd, training_set, stats: Dict) -> Generator[Ragged, None, None]:
+        """
+        Generates the training samples of a language, in batches, enforcing
+        max_samples and max_length and updating the generation stats
+        """
+        # Backends don't generate samples longer than max_length, the
+        # check in _filter_batches only guards against backends ignoring it
+        max_length = lang_config['max_length']
+        if lang_config['pipeline'] is None:
+            batches = bkd.gen_batches(Runner.batch_size, max_length=max_length)
+        else:
+            if lang_config['pipeline'] == 'process':
+                make_gen = partial(lang_batches, lang_config, Runner.batch_size, max_length)
+            else:
+                make_gen = partial(bkd.gen_batches, Runner.batch_size, max_length)
+            batches = Prefetcher(
+                make_gen,
+                max_queue=lang_config['pipeline_queue_size'],
+                mode=lang_config['pipeline'],
+                stats=stats,
+            )
+
+        pbar = tqdm(total=lang_config['max_samples'])
+        try:
+            yield from self._filter_batches(lang_config, batches, training_set, stats, pbar)
+        finally:
+            batches.close()
+            pbar.close()
+
+    def _filter_batches(self, lang_config: Dict, batches, training_set, stats: Dict, pbar) -> Generator[Ragged, None, None]:
+        max_length = lang_config['max_length']
+        max_samples = lang_config['max_samples']
+        for batch in batches:
+            # Drop the samples beyond max_samples
+            remaining = max_samples - stats['training_samples_generated']
+            if len(batch) > remaining:
+                batch = batch.take(np.arange(remaining))
+            pbar.update(len(batch))
+            stats['training_samples_generated'] += len(batch)
+
+            # Enforce max_length
+            lengths = batch.lengths()
+            if max_length is not None:
+                keep = lengths <= max_length
+                if not keep.all():
+                    stats['training_samples_skipped'] += int((~keep).sum())
+                    batch = batch.take(keep)
+
+            # Track duplicates, and drop them if requested
+            new = training_set.add(batch)
+            stats['training_samples_duplicated'] += int((~new).sum())
+            if lang_config['dedup'] and not new.all():
+                batch = batch.take(new)
+
+            lengths = batch.lengths()
+            if len(batch) > 0:
+                # Update max_sample_length
+                stats['max_training_sample_length'] = max(
+                    stats['max_training_sample_length'], int(lengths.max()))
+
+                # Update min_sample_length
+                if stats['training_samples_used'] == 0:
+                    stats['min_training_sample_length'] = int(lengths.min())
+                else:
+                    stats['min_training_sample_length'] = min(
+                        stats['min_training_sample_length'], int(lengths.min()))
+
+            # Yield batch
+            stats['training_samples_used'] += len(batch)
+            yield batch
+
+            if stats['training_samples_generated'] >= max_samples:
+                break
+
+    def _test(self, run_name: str, lang_config: Dict, bkd, net: Net, training_set) -> Dict:
+        """
+        Evaluates a trained net, returns the testing stats
+        """
+        stats = {
+            'correct_generated' : 0,
+            'generated_unique' : 0,
+            'generated_in_training' : 0,
+            'generated_novel_correct' : 0,
+            'avg_length' : 0,
+        }
+
+        print(f"[*] Start testing")
+        sum_lengths = 0
+        in_training = 0
+        novel_correct = 0
+        generated_set = ExactSampleSet()
+        test_samples = lang_config['test_samples']
+        pbar = tqdm(total=test_samples)
+        with self._profiler.phase(run_name, 'testing', stats):
+            for i in range(0, test_samples, Runner.batch_size):
+                batch = net.gen_batch(min(Runner.batch_size, test_samples-i))
+                correct = bkd.parse_batch(batch)
+                seen = training_set.contains(batch)
+                generated_set.add(batch)
+                stats['correct_generated'] += int(correct.sum())
+                in_training += int(seen.sum())
+                novel_correct += int((correct & ~seen).sum())
+                sum_lengths += int(batch.lengths().sum())
+                pbar.update(len(batch))
+        pbar.close()
+
+        # Fractions of the generated samples
+        stats['generated_unique'] = len(generated_set) / max(test_samples, 1)
+        stats['generated_in_training'] = in_training / max(test_samples, 1)
+        stats['generated_novel_correct'] = novel_correct / max(test_samples, 1)
+        stats['avg_length'] = sum_lengths / max(test_samples, 1)
+        print(f"[*] Testing finished")
+        return stats
 
-        # Get configs
-        lang_config = self._langs_config[lang_name]
-        net_config = self._nets_config[net_name]
+    def _run_job(self, job: Dict) -> None:
+        """
+        Runs a generation job (see plan): generates the training samples once,
+        trains each net once and evaluates it for every run
+        """
+        lang_config = job['lang_config']
+        gen_name = job['lang_names'][0]
 
         # Inititalize lang and get backend
         lang = INDEX['langs'][lang_config["lang"]]()
         lang.init(params=lang_config)
         bkd = lang.get()
-
-        # Collect network initialization params
-        net = INDEX['nets'][net_config["net"]]()
-        net_params = {
-            **lang_config,
-            **net_config,
-            'alphabet_size': lang.alphabet_size,
-            'shape': lang.shape,
-        }
+        if bkd.dtype != lang.dtype:
+            raise ValueError(
+                f"Backend of lang {lang_config['lang']} generates {bkd.dtype} "
+                f"tokens, expected {lang.dtype}")
 
         # Show lang parameters
+        print(f"[*] Lang: {', '.join(job['lang_names'])}")
         print("[*] Lang parameters:")
         for k, v in lang_config.items():
             print(f"\t{k}: {v}")
 
-        # Show net parameters
-        print("[*] Net parameters:")
-        for k, v in net_params.items():
-            print(f"\t{k}: {v}")
-
-        # Some stats about the run
-        stats = {
+        # Some stats about the training samples
+        gen_stats = {
             'training_samples_generated' : 0,
             'max_training_sample_length' : 0,
             'min_training_sample_length' : 0,
             'training_samples_skipped' : 0,
             'training_samples_used' : 0,
-            'correct_generated' : 0,
-            'training_time': 0,
-            'avg_length' : 0,
+            'training_samples_duplicated' : 0,
         }
 
-        # Retrieve the length dimension
-        try:
-            length_index = lang.shape.index(None)
-        except:
-            length_index = None
-
-        def _gen():
-            max_length = lang_config['max_length']
-            max_samples = lang_config['max_samples']
-            gen = bkd.gen()
-            pbar = tqdm(total=max_samples)
-            while stats['training_samples_generated'] < max_samples:
-                try:
-                    sample = next(gen)
-                    pbar.update(1)
-                    stats['training_samples_generated'] += 1
-                except StopIteration:
-                    break
-
-                if length_index is not None:
-                    # Enforce max_length
-                    if sample.shape[length_index] > max_length:
-                        stats['training_samples_skipped'] += 1
-                        continue
-                    
-                    # Update max_sample_length
-                    if sample.shape[length_index] > stats['max_training_sample_length']:
-                        stats['max_training_sample_length'] = sample.shape[length_index]
-
-                    # Update min_sample_length
-                    if sample.shape[length_index] < stats['min_training_sample_length']:
-                        stats['min_training_sample_length'] = sample.shape[length_index]
-
-                # Yield sample
-                stats['training_samples_used'] += 1
-                yield sample
-            pbar.close()
-
-
-        # Initialize and train the network
-        net.init(params=net_params)
-        print(f"[*] Start training")
-        start_time = time.time()
-        net.train(gen=_gen())
-        end_time = time.time()
-        stats['training_time'] = end_time - start_time
-        print(f"[*] Training finished")
-
-        print(f"[*] Start testing")
-        sum_lengths = 0
-        for _ in trange(lang_config['test_samples']):
-            sample = net.gen()
-            if bkd.parse(sample):
-                stats['correct_generated'] += 1
-            if length_index is not None:
-                sum_lengths += sample.shape[length_index]
-
-        if length_index is None:
-            stats['avg_length'] = 'not applicable'
-        else:
-            stats['avg_length'] = sum_lengths / lang_config['test_samples']
-        print(f"[*] Testing finished")
-    
-        return stats
-
-
-    def run(self):
-        for lang_name in self._langs_config.keys():
-            for net_name in self._nets_config.keys():
+        # All the training samples seen so far
+        training_set = make_sample_set(
+            Runner.sample_set_kind(lang_config),
+            capacity=lang_config['max_samples'],
+            error_rate=lang_config['sample_set_error_rate'],
+        )
+        batches = self._gen_batches(lang_config, bkd, training_set, gen_stats)
+
+        # The training samples are stored once and reused by all the nets,
+        # unless there is a single net to train on them. Large sets that
+        # are not stored in a corpus go to a temporary one, smaller ones are
+        # kept in memory.
+        corpus = None
+        cache = None
+        tmp_dir = None
+        corpus_path = None
+        if lang_config['corpus'] is not None:
+            corpus_path = os.path.join(lang_config['corpus'], gen_name)
+        elif len(job['trainings']) > 1 and lang_config['max_samples'] > Runner.max_cached_samples:
+            tmp_dir = tempfile.TemporaryDirectory(prefix='deepchall_')
+            corpus_path = tmp_dir.name
+
+        if corpus_path is not None:
+            print(f"[*] Writing corpus to {corpus_path}")
+            with self._profiler.phase(gen_name, 'corpus', gen_stats):
+                with CorpusWriter(corpus_path, alphabet_size=lang.alphabet_size) as writer:
+                    for batch in batches:
+                        writer.write_batch(batch)
+            corpus = Corpus(corpus_path)
+        elif len(job['trainings']) > 1:
+            print(f"[*] Generating training samples")
+            with self._profiler.phase(gen_name, 'generation', gen_stats):
+                cache = list(batches)
+
+        for training in job['trainings']:
+            net_name = training['net_name']
+            train_config = training['lang_config']
+            net_config = self._nets_config[net_name]
+            run_name = f"{training['runs'][0][0]}_{net_name}"
+
+            # Collect network initialization params
+            net = INDEX['nets'][net_config["net"]]()
+            net_params = {
+                **train_config,
+                **net_config,
+                'alphabet_size': lang.alphabet_size,
+                'dtype': lang.dtype,
+                'shape': lang.shape,
+            }
+
+            # Show net parameters
+            print(f"[*] Net: {net_name}")
+            print("[*] Net parameters:")
+            for k, v in net_params.items():
+                print(f"\t{k}: {v}")
+
+            # Initialize and train the network
+            train_stats = {}
+            net.init(params=net_params)
+            print(f"[*] Start training")
+            start_time = time.time()
+            with self._profiler.phase(run_name, 'training', train_stats):
+                if corpus is not None:
+                    net.train_corpus(corpus)
+                elif cache is not None:
+                    net.train_batches(iter(cache))
+                else:
+                    net.train_batches(batches)
+            end_time = time.time()
+            train_stats['training_time'] = end_time - start_time
+            print(f"[*] Training finished")
+
+            # Runs with the same testing params share the evaluation
+            evaluations = {}
+            for lang_name, net_name in training['runs']:
+                run_config = self._langs_config[lang_name]
+                test_key = Runner._key({
+                    k: run_config[k] for k in Runner.testing_lang_params
+                })
                 print(f"[*] Running lang: {lang_name} vs {net_name}")
-                stats = self._run_net(lang_name, net_name)
+                if test_key not in evaluations:
+                    evaluations[test_key] = self._test(
+                        f"{lang_name}_{net_name}", run_config, bkd, net, training_set)
+                stats = {**gen_stats, **evaluations[test_key], **train_stats}
                 print(f"[*] Run finished")
                 print(f"[*] Stats:")
                 for k, v in stats.items():
                     print(f"\t{k}: {v}")
 
+        # The temporary corpus is not needed once all the nets are trained,
+        # if a run fails it is removed when tmp_dir is collected
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
 
+    def run(self):
+        plan = self.plan()
+        num_trainings = sum(len(job['trainings']) for job in plan)
+        num_runs = len(self._langs_config) * len(self._nets_config)
+        print(
+            f"[*] Planned {num_runs} runs: {len(plan)} sample generations, "
+            f"{num_trainings} trainings"
+        )
+        for job in plan:
+            self._run_job(job)
@@ -19,10 +19,35 @@ def test_lang(lang_name):
     ))
 
     bkd = lang.get()
+    assert bkd.dtype == lang.dtype
     gen = bkd.gen()
     try:
         for _ in range(max_samples):
             sample = next(gen)
             assert bkd.parse(sample)
     except StopIteration:
-        pass
\ No newline at end of file
+        pass
+
+@pytest.mark.parametrize(
+    "lang_name", INDEX["langs"].keys()
+)
+def test_lang_batches(lang_name):
+    lang = INDEX["langs"][lang_name]()
+    lang.init(params=Runner.make_lang_params(
+        lang=lang,
+        user_params={
+            "max_samples": 50,
+            "max_length": None,
+        }
+    ))
+
+    bkd = lang.get()
+    batch = next(bkd.gen_batches(50))
+    assert batch.dtype == lang.dtype
+    assert batch.values.max() < lang.alphabet_size
+    assert bkd.parse_batch(batch).all()
+
+    gen = bkd.gen()
+    for sample in batch:
+        assert sample.dtype == lang.dtype
+        assert (sample == next(gen)).all()
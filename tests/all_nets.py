@@ -0,0 +1,123 @@
+from deepchall.index import INDEX
+from deepchall.runner import Runner
+import itertools
+import os
+import subprocess
+import sys
+import numpy as np
+import pytest
+
+@pytest.mark.parametrize(
+    "net_name", INDEX["nets"].keys()
+)
+def test_net(net_name):
+    lang = INDEX["langs"]["toy_fsm"]()
+    lang_params = Runner.make_lang_params(
+        lang=lang,
+        user_params={
+            "max_samples": 20,
+            "max_length": 8,
+            "epochs": 1,
+        }
+    )
+    lang.init(params=lang_params)
+    bkd = lang.get()
+
+    net = INDEX["nets"][net_name]()
+    net.init(params={
+        **lang_params,
+        **Runner.make_net_params(net=net, user_params={"net": net_name}),
+        "alphabet_size": lang.alphabet_size,
+        "dtype": lang.dtype,
+        "shape": lang.shape,
+    })
+
+    def gen():
+        samples = bkd.gen()
+        for _ in range(lang_params["max_samples"]):
+            yield next(samples)
+    net.train(gen())
+
+    for _ in range(5):
+        sample = net.gen()
+        assert sample.shape[0] == 1
+        assert sample.shape[1] <= lang_params["max_length"]
+        assert ((0 <= sample) & (sample < lang.alphabet_size)).all()
+
+    batch = net.gen_batch(50)
+    assert len(batch) == 50
+    assert (batch.lengths() <= lang_params["max_length"]).all()
+
+@pytest.mark.parametrize(
+    "net_name", INDEX["nets"].keys()
+)
+def test_net_train_batches(net_name):
+    lang = INDEX["langs"]["toy_fsm"]()
+    lang_params = Runner.make_lang_params(
+        lang=lang,
+        user_params={
+            "max_samples": 20,
+            "max_length": 8,
+            "epochs": 1,
+        }
+    )
+    lang.init(params=lang_params)
+    bkd = lang.get()
+
+    net = INDEX["nets"][net_name]()
+    net.init(params={
+        **lang_params,
+        **Runner.make_net_params(net=net, user_params={"net": net_name}),
+        "alphabet_size": lang.alphabet_size,
+        "dtype": lang.dtype,
+        "shape": lang.shape,
+    })
+
+    # Batches filtered by the runner can be empty
+    batches = list(itertools.islice(bkd.gen_batches(10), 2))
+    empty = batches[0].take(np.zeros(0, dtype=np.int64))
+    net.train_batches(iter([batches[0], empty, batches[1]]))
+
+    batch = net.gen_batch(10)
+    assert len(batch) == 10
+    assert (batch.lengths() <= lang_params["max_length"]).all()
+
+def test_ngram_learns_toy_fsm():
+    lang = INDEX["langs"]["toy_fsm"]()
+    lang_params = Runner.make_lang_params(
+        lang=lang,
+        user_params={"max_samples": 2000, "max_length": 10}
+    )
+    lang.init(params=lang_params)
+    bkd = lang.get()
+
+    net = INDEX["nets"]["ngram"]()
+    net.init(params={
+        **lang_params,
+        **Runner.make_net_params(net=net, user_params={"seed": 0}),
+        "alphabet_size": lang.alphabet_size,
+        "dtype": lang.dtype,
+        "shape": lang.shape,
+    })
+
+    def gen():
+        samples = bkd.gen()
+        for _ in range(lang_params["max_samples"]):
+            yield next(samples)
+    net.train(gen())
+
+    correct = sum(bkd.parse(net.gen()) for _ in range(100))
+    assert correct >= 90
+
+def test_index_lazy_nets():
+    # Heavy nets are only imported when used, not with the index
+    code = (
+        'import sys; from deepchall.index import INDEX; '
+        'INDEX["nets"]["ngram"]; print("tensorflow" in sys.modules)'
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run(
+        [sys.executable, '-c', code], cwd=root,
+        capture_output=True, text=True, check=True,
+    ).stdout
+    assert out.split() == ['False']
@@ -0,0 +1,42 @@
+from deepchall.corpus import Corpus, CorpusWriter, write_corpus
+from deepchall.ragged import compact_dtype
+from deepchall.index import INDEX
+import numpy as np
+import pytest
+
+def test_compact_dtype():
+    assert compact_dtype(2) == np.uint8
+    assert compact_dtype(256) == np.uint8
+    assert compact_dtype(257) == np.uint16
+    assert compact_dtype(2**16+1) == np.uint32
+
+def test_roundtrip(tmp_path):
+    lang = INDEX["langs"]["toy_fsm"]()
+    lang.init(params={})
+    gen = lang.get().gen()
+    samples = [next(gen) for _ in range(200)]
+
+    corpus = write_corpus(str(tmp_path), samples, alphabet_size=lang.alphabet_size)
+    assert len(corpus) == len(samples)
+    assert corpus.num_tokens == sum(s.shape[1] for s in samples)
+    for a, b in zip(corpus, samples):
+        assert (a == b).all()
+
+    # Every sample appears exactly once across the shuffled batches
+    seen = []
+    for batch in corpus.batches(batch_size=32, length=10, seed=0):
+        assert batch.shape[1] == 10
+        for row in batch:
+            seen.append(tuple(row[row != -1]))
+    assert sorted(seen) == sorted(tuple(s[0]) for s in samples)
+
+def test_write_errors(tmp_path):
+    with CorpusWriter(str(tmp_path), alphabet_size=3) as writer:
+        with pytest.raises(ValueError):
+            writer.write(np.array([[0, 3]]))
+        with pytest.raises(ValueError):
+            writer.write(np.array([0, 1]))
+        writer.write(np.array([[]]))
+    corpus = Corpus(str(tmp_path))
+    assert len(corpus) == 1
+    assert corpus[0].shape == (1, 0)
@@ -0,0 +1,33 @@
+from deepchall.dedup import sample_hashes, make_sample_set
+from deepchall.ragged import Ragged
+import numpy as np
+import pytest
+
+def test_sample_hashes():
+    batch = Ragged.from_lists([[0, 1], [1, 0], [0, 1], [], [0], [0, 0]], dtype=np.uint8)
+    hashes = sample_hashes(batch)
+    assert hashes[0] == hashes[2]
+    assert len(set(hashes.tolist())) == 5
+    assert (sample_hashes(batch.take([2, 0])) == hashes[[2, 0]]).all()
+    assert (sample_hashes(batch, seed=1) != hashes).all()
+
+@pytest.mark.parametrize("kind", ["exact", "bloom"])
+def test_sample_set(kind):
+    samples = make_sample_set(kind, capacity=1000, error_rate=0.001)
+    first = Ragged.from_lists([[0, 1], [1, 0], [0, 1], []], dtype=np.uint8)
+    assert samples.add(first).tolist() == [True, True, False, True]
+    assert len(samples) == 3
+
+    second = Ragged.from_lists([[1, 0], [1, 1], []], dtype=np.uint8)
+    assert samples.contains(second).tolist() == [True, False, True]
+    assert samples.add(second).tolist() == [False, True, False]
+    assert len(samples) == 4
+
+def test_bloom_error_rate():
+    rng = np.random.default_rng(0)
+    samples = make_sample_set("bloom", capacity=10000, error_rate=0.01)
+    exprs = [rng.integers(256, size=8).tolist() for _ in range(20000)]
+    samples.add(Ragged.from_lists(exprs[:10000], dtype=np.uint8))
+    assert samples.contains(Ragged.from_lists(exprs[:10000], dtype=np.uint8)).all()
+    false_positives = samples.contains(Ragged.from_lists(exprs[10000:], dtype=np.uint8))
+    assert false_positives.mean() < 0.02
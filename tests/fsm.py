@@ -0,0 +1,68 @@
+from deepchall.backends.fsm import FSM
+from deepchall.index import INDEX
+from deepchall.runner import Runner
+import itertools
+import numpy as np
+
+def _simulate(fsm, expr):
+    """
+    Reference parser, simulates the FSM on all the paths at once
+    """
+    states = {fsm}
+    for symbol in expr:
+        states = {t for s in states for t in s.traverse(symbol)}
+    return any(s.is_terminal() for s in states)
+
+def test_distances():
+    s = [FSM() for _ in range(5)]
+    s[0].add_transition(input_symbol=0, states=[s[1], s[3]])
+    s[1].add_transition(input_symbol=1, states=[s[2]])
+    s[2].add_transition(input_symbol=2, states=[s[2]])
+    s[2].set_terminal(True)
+    # s[3] only leads to a loop without terminal states
+    s[3].add_transition(input_symbol=1, states=[s[4]])
+    s[4].add_transition(input_symbol=1, states=[s[3]])
+
+    shortest, longest = s[0]._distances()
+    assert [shortest[x] for x in s] == [2, 1, 0, float('inf'), float('inf')]
+    assert [longest[x] for x in s[:3]] == [float('inf')]*3
+
+    exprs = [e.tolist() for e in s[0].gen(max_length=4)]
+    assert exprs == [[[0, 1]], [[0, 1, 2]], [[0, 1, 2, 2]]]
+
+def test_dead_states_pruned_without_max_length():
+    s = [FSM() for _ in range(4)]
+    s[0].add_transition(input_symbol=0, states=[s[1]])
+    s[0].add_transition(input_symbol=1, states=[s[2]])
+    s[0].set_terminal(False)
+    s[1].set_terminal(True)
+    # s[2] and s[3] form a loop without terminal states, generation would
+    # never end if it was explored
+    s[2].add_transition(input_symbol=1, states=[s[3]])
+    s[3].add_transition(input_symbol=1, states=[s[2]])
+
+    assert [e.tolist() for e in s[0].gen()] == [[[0]]]
+    assert list(s[2].gen()) == []
+
+def test_pruning_matches_reference():
+    lang = INDEX['langs']['random_fsm']()
+    lang.init(params=Runner.make_lang_params(
+        lang=lang, user_params={'num_states': 200, 'terminal_ratio': 0.05}))
+    fsm = lang.get()
+
+    # Pruned generation yields all the expressions up to max_length
+    max_length = 6
+    pruned = [tuple(e[0]) for e in fsm.gen(max_length=max_length)]
+    reference = [
+        tuple(e[0]) for e in itertools.takewhile(
+            lambda e: e.shape[1] <= max_length, FSM.gen(fsm))
+    ]
+    assert sorted(pruned) == sorted(reference)
+
+    # Pruned parsing agrees with the simulation
+    rng = np.random.default_rng(0)
+    for _ in range(500):
+        expr = rng.integers(lang.alphabet_size, size=(1, rng.integers(8)))
+        assert fsm.parse(expr) == _simulate(fsm, expr[0].tolist())
+    for expr in pruned[:100]:
+        assert fsm.parse(np.array([expr]))
@@ -0,0 +1,77 @@
+from deepchall.pipeline import Prefetcher, lang_batches
+from deepchall.index import INDEX
+from deepchall.runner import Runner
+from functools import partial
+import itertools
+import os
+import subprocess
+import sys
+import time
+import pytest
+
+def test_thread_prefetcher():
+    stats = {}
+    items = Prefetcher(partial(range, 100), max_queue=4, stats=stats)
+    assert list(items) == list(range(100))
+    assert stats['queue_max_depth'] <= 4
+    assert 'producer_stall_time' in stats
+    assert 'consumer_stall_time' in stats
+
+def test_prefetcher_early_close():
+    items = Prefetcher(partial(itertools.count), max_queue=2)
+    assert [next(items) for _ in range(10)] == list(range(10))
+    items.close()
+
+def test_prefetcher_close_full_queue():
+    # The producer is done but can't put its end marker in the full queue
+    items = Prefetcher(partial(iter, range(3)), max_queue=2)
+    assert next(items) == 0
+    time.sleep(0.2)
+    start_time = time.time()
+    items.close()
+    assert time.time() - start_time < 0.5
+    assert not items._worker.is_alive()
+
+def _failing_gen():
+    yield 1
+    raise RuntimeError('boom')
+
+def test_prefetcher_error():
+    items = Prefetcher(_failing_gen, max_queue=2)
+    assert next(items) == 1
+    with pytest.raises(RuntimeError):
+        next(items)
+
+@pytest.mark.parametrize("lang_name", ['toy_fsm', 'toy_cfg', 'random_cfg'])
+def test_process_prefetcher(lang_name):
+    lang = INDEX['langs'][lang_name]()
+    lang_config = Runner.make_lang_params(lang=lang, user_params={'lang': lang_name})
+    lang.init(params=lang_config)
+    bkd = lang.get()
+    expected = list(itertools.islice(bkd.gen_batches(10), 5))
+
+    batches = Prefetcher(
+        partial(lang_batches, lang_config, 10), max_queue=2, mode='process')
+    try:
+        for batch, other in zip(batches, expected):
+            assert (batch.values == other.values).all()
+            assert (batch.offsets == other.offsets).all()
+            # The samples generated by the other process must be
+            # encoded the same way as in this process
+            assert bkd.parse_batch(batch).all()
+    finally:
+        batches.close()
+
+def test_lang_batches_imports():
+    # The producer process builds the lang without importing the nets
+    code = (
+        'import sys; from deepchall.pipeline import lang_batches; '
+        'next(lang_batches({"lang": "toy_fsm"}, 10)); '
+        'print(any(m.startswith("deepchall.nets") for m in sys.modules))'
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run(
+        [sys.executable, '-c', code], cwd=root,
+        capture_output=True, text=True, check=True,
+    ).stdout
+    assert out.split() == ['False']
@@ -0,0 +1,38 @@
+from deepchall.profiling import Profiler
+from deepchall.pipeline import Prefetcher
+import os
+
+def test_profiler(tmp_path):
+    stats = {}
+    profiler = Profiler(str(tmp_path), top=5)
+    with profiler.phase('run', 'alloc', stats):
+        data = [list(range(100)) for _ in range(100)]
+    with profiler.phase('run', 'sum', stats):
+        sum(map(sum, data))
+
+    assert stats['peak_memory_alloc'] > 0
+    assert 'peak_memory_sum' in stats
+    assert os.path.exists(tmp_path / 'run_alloc.prof')
+    assert os.path.exists(tmp_path / 'run_sum.prof')
+    summary = (tmp_path / 'run_summary.txt').read_text()
+    assert '=== alloc' in summary and '=== sum' in summary
+
+def _produce_squares():
+    for i in range(1000):
+        yield i*i
+
+def test_profiler_threads(tmp_path):
+    stats = {}
+    profiler = Profiler(str(tmp_path), top=50)
+    with profiler.phase('run', 'prefetch', stats):
+        assert sum(Prefetcher(_produce_squares, max_queue=4)) > 0
+
+    # The producer thread is part of the profile
+    summary = (tmp_path / 'run_summary.txt').read_text()
+    assert '_produce_squares' in summary
+
+def test_disabled_profiler():
+    stats = {}
+    with Profiler().phase('run', 'noop', stats):
+        pass
+    assert stats == {}
@@ -0,0 +1,26 @@
+from deepchall.ragged import Ragged
+import numpy as np
+
+def test_ragged():
+    batch = Ragged.from_lists([[0, 1], [], [2, 2, 1]], dtype=np.uint8)
+    assert len(batch) == 3
+    assert batch.dtype == np.uint8
+    assert batch.lengths().tolist() == [2, 0, 3]
+    assert batch[0].tolist() == [[0, 1]]
+    assert batch[1].shape == (1, 0)
+    assert batch[-1].tolist() == [[2, 2, 1]]
+
+    padded = batch.padded(pad_value=-1)
+    assert padded.tolist() == [[0, 1, -1], [-1, -1, -1], [2, 2, 1]]
+    same = Ragged.from_padded(padded, batch.lengths(), dtype=np.uint8)
+    assert (same.values == batch.values).all()
+    assert (same.offsets == batch.offsets).all()
+
+    taken = batch.take([2, 0])
+    assert [s.tolist() for s in taken] == [[[2, 2, 1]], [[0, 1]]]
+    masked = batch.take(np.array([False, True, True]))
+    assert masked.lengths().tolist() == [0, 3]
+
+    samples = Ragged.from_samples(list(batch), dtype=np.uint8)
+    assert (samples.values == batch.values).all()
+    assert (samples.offsets == batch.offsets).all()
@@ -0,0 +1,50 @@
+from deepchall.index import INDEX
+from deepchall.runner import Runner
+import itertools
+import json
+import os
+import subprocess
+import sys
+import pytest
+
+def _samples(lang_name, seed, num=50):
+    lang = INDEX['langs'][lang_name]()
+    lang.init(params=Runner.make_lang_params(
+        lang=lang, user_params={'lang': lang_name, 'seed': seed}))
+    return [e[0].tolist() for e in itertools.islice(lang.get().gen(), num)]
+
+@pytest.mark.parametrize("lang_name", ['random_fsm', 'random_cfg'])
+def test_same_seed_same_lang(lang_name):
+    samples = _samples(lang_name, seed=1)
+    assert len(samples) > 0
+    assert samples == _samples(lang_name, seed=1)
+    assert samples != _samples(lang_name, seed=2)
+
+@pytest.mark.parametrize("lang_name", ['random_fsm', 'random_cfg'])
+def test_same_seed_across_processes(lang_name):
+    # Another process, with another hash seed, must build the same language
+    tests_dir = os.path.dirname(os.path.abspath(__file__))
+    root = os.path.dirname(tests_dir)
+    code = (
+        'import json; from random_langs import _samples; '
+        f'print(json.dumps(_samples("{lang_name}", seed=1)))'
+    )
+    out = subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=root,
+        env={
+            **os.environ,
+            'PYTHONHASHSEED': '123',
+            'PYTHONPATH': os.pathsep.join([tests_dir, root]),
+        },
+        capture_output=True, text=True, check=True,
+    ).stdout
+    assert json.loads(out.splitlines()[-1]) == _samples(lang_name, seed=1)
+
+def test_random_fsm_not_empty():
+    # Small FSMs often have no terminal state reachable by chance
+    for seed in range(50):
+        lang = INDEX['langs']['random_fsm']()
+        lang.init(params=Runner.make_lang_params(
+            lang=lang, user_params={'num_states': 10, 'seed': seed}))
+        assert next(lang.get().gen(), None) is not None
@@ -0,0 +1,135 @@
+from deepchall.index import INDEX
+from deepchall.runner import Runner
+from deepchall.corpus import Corpus
+import json
+import os
+import pytest
+
+def _write_config(tmp_path, config):
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps(config))
+    return str(path)
+
+def test_expand_sweeps():
+    entries = Runner.expand_sweeps({
+        'a': {'net': 'ngram', 'order': {'range': [2, 4]}, 'alpha': {'sweep': [0.1, 1]}},
+        'b': {'net': 'ngram', 'order': 3},
+    }, fixed=('net',))
+    assert list(entries) == [
+        'a[order=2,alpha=0.1]', 'a[order=2,alpha=1]',
+        'a[order=3,alpha=0.1]', 'a[order=3,alpha=1]',
+        'b',
+    ]
+    assert entries['a[order=3,alpha=1]'] == {'net': 'ngram', 'order': 3, 'alpha': 1}
+
+    with pytest.raises(ValueError):
+        Runner.expand_sweeps({'a': {'net': {'sweep': ['ngram']}}}, fixed=('net',))
+
+def test_fixed_params_not_swept(tmp_path):
+    with pytest.raises(ValueError, match='Param lang cannot be swept'):
+        Runner(_write_config(tmp_path, {
+            'nets': {'ng': {'net': 'ngram'}},
+            'langs': {'fsm': {'lang': {'sweep': ['toy_fsm', 'toy_cfg']}}},
+        }))
+    with pytest.raises(ValueError, match='Param net cannot be swept'):
+        Runner(_write_config(tmp_path, {
+            'nets': {'ng': {'net': {'sweep': ['ngram']}}},
+            'langs': {'fsm': {'lang': 'toy_fsm'}},
+        }))
+
+def test_sample_set_kind():
+    config = {**Runner.default_lang_params, 'max_samples': 100}
+    assert Runner.sample_set_kind(config) == 'exact'
+    assert Runner.sample_set_kind({**config, 'corpus': 'corpus'}) == 'bloom'
+    assert Runner.sample_set_kind(
+        {**config, 'max_samples': Runner.max_exact_samples+1}) == 'bloom'
+    assert Runner.sample_set_kind(
+        {**config, 'corpus': 'corpus', 'sample_set': 'exact'}) == 'exact'
+
+def test_plan(tmp_path, monkeypatch):
+    config = _write_config(tmp_path, {
+        'nets': {'ng': {'net': 'ngram', 'order': {'sweep': [2, 3]}}},
+        'langs': {
+            'fsm': {
+                'lang': 'toy_fsm',
+                'max_length': 10,
+                'epochs': {'sweep': [1, 2]},
+                'test_samples': {'sweep': [10, 20]},
+            },
+            'fsm_short': {'lang': 'toy_fsm', 'max_length': 5},
+        },
+    })
+
+    # ngram ignores epochs, each net is trained once per distinct max_length
+    plan = Runner(config).plan()
+    assert len(plan) == 2
+    assert [len(job['trainings']) for job in plan] == [2, 2]
+    assert sum(
+        len(t['runs']) for job in plan for t in job['trainings']
+    ) == 5 * 2
+
+    # Otherwise each net is trained once per distinct epochs
+    monkeypatch.setattr(INDEX['nets']['ngram'], 'ignored_lang_params', ())
+    plan = Runner(config).plan()
+    assert len(plan) == 2
+    assert [len(job['trainings']) for job in plan] == [4, 2]
+
+def test_run(tmp_path, capsys):
+    runner = Runner(_write_config(tmp_path, {
+        'nets': {'ng': {'net': 'ngram', 'order': {'sweep': [2, 3]}}},
+        'langs': {
+            'fsm': {
+                'lang': 'toy_fsm',
+                'max_length': 10,
+                'max_samples': 200,
+                'test_samples': {'sweep': [10, 20]},
+            },
+        },
+    }))
+    runner.run()
+    out = capsys.readouterr().out
+    assert '[*] Planned 4 runs: 1 sample generations, 2 trainings' in out
+    assert out.count('[*] Run finished') == 4
+    assert out.count('\ttraining_samples_generated: 200') == 4
+
+def test_run_corpus_sweep(tmp_path, capsys):
+    runner = Runner(_write_config(tmp_path, {
+        'nets': {'ng': {'net': 'ngram'}},
+        'langs': {
+            'fsm': {
+                'lang': 'toy_fsm',
+                'max_length': {'sweep': [5, 10]},
+                'max_samples': 50,
+                'test_samples': 10,
+                'corpus': str(tmp_path / 'corpus'),
+            },
+        },
+    }))
+    runner.run()
+
+    # Every generation job writes its own corpus
+    for max_length in (5, 10):
+        corpus = Corpus(str(tmp_path / 'corpus' / f'fsm[max_length={max_length}]'))
+        assert len(corpus) == 50
+        assert corpus.lengths().max() <= max_length
+
+def test_run_temporary_corpus(tmp_path, capsys, monkeypatch):
+    monkeypatch.setattr(Runner, 'max_cached_samples', 10)
+    runner = Runner(_write_config(tmp_path, {
+        'nets': {'ng': {'net': 'ngram', 'order': {'sweep': [2, 3]}}},
+        'langs': {
+            'fsm': {
+                'lang': 'toy_fsm',
+                'max_length': 10,
+                'max_samples': 50,
+                'test_samples': 10,
+            },
+        },
+    }))
+    runner.run()
+    out = capsys.readouterr().out
+    assert out.count('[*] Run finished') == 2
+
+    # The temporary corpus is removed once done
+    path = out.split('[*] Writing corpus to ')[1].splitlines()[0]
+    assert not os.path.exists(path)